@@ -0,0 +1,47 @@
+#!/usr/bin/env python
+
+"""Compares throughput of the JSON and binary wire formats.
+
+Messages are sent through an inproc PAIR socket, so the numbers
+include encoding, the ZeroMQ hop and decoding, but no network stack.
+
+"""
+
+import os
+import sys
+import time
+import zmq
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from nestrl import codec  # noqa: E402
+
+
+def measure(fmt, n_channels, n_messages):
+    """Returns messages per second for sending and receiving `n_messages`.
+
+    """
+    ctx = zmq.Context.instance()
+    tx = ctx.socket(zmq.PAIR)
+    rx = ctx.socket(zmq.PAIR)
+    tx.bind('inproc://codec-benchmark')
+    rx.connect('inproc://codec-benchmark')
+
+    msg = codec.GymObservation(-1., 1., [0.5] * n_channels)
+
+    t_start = time.perf_counter()
+    for _ in range(n_messages):
+        codec.send(tx, msg, fmt)
+        codec.recv(rx)
+    t_total = time.perf_counter() - t_start
+
+    tx.close()
+    rx.close()
+    return n_messages / t_total
+
+
+n_messages = 2000
+
+print('{:>10} {:>14} {:>14} {:>8}'.format('channels', 'json (msg/s)', 'binary (msg/s)', 'speedup'))
+for n_channels in [1, 8, 64, 512]:
+    rate = {fmt: measure(fmt, n_channels, n_messages) for fmt in codec.FORMATS}
+    print('{:>10} {:>14.0f} {:>14.0f} {:>8.1f}'.format(n_channels, rate['json'], rate['binary'], rate['binary'] / rate['json']))
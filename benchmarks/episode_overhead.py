@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+
+"""Compares the overhead per episode of rebuilding the network with a `Worker` reset.
+
+Rebuilding covers what every episode launched via MUSIC repeats within
+NEST: ``nest.ResetKernel()``, creating and connecting all nodes and
+``nest.Prepare()``. A `nestrl.worker.Worker` only silences the inputs,
+simulates five synaptic time constants and restores the state of the neurons. The
+import of NEST and the MPI startup, which a fresh launch adds on top,
+are not included (see ``startup_time.py``).
+
+"""
+
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from nestrl import network  # noqa: E402
+from nestrl.worker import Worker  # noqa: E402
+
+import nest  # noqa: E402
+
+max_rate = 50.  # 1/s
+resolution = 1.  # ms
+indegree = 100
+n_envs = 8
+n_repeats = 5
+
+
+def build(size):
+    """Builds the controllers of all environments and returns the worker of the network.
+
+    """
+    nest.ResetKernel()
+    nest.set_verbosity('M_ERROR')
+    nest.SetKernelStatus({'resolution': resolution})
+
+    pg = nest.Create('poisson_generator', n_envs, {'rate': max_rate / 2.})
+    circuit = network.build_circuit(pg, size=size, indegree=indegree, max_rate=max_rate)
+    sd = nest.Create('spike_detector')
+    for population in circuit.command:
+        nest.Connect(population, sd)
+    neurons = sum(circuit.left + circuit.right + circuit.command, ())
+    return Worker(neurons, [sd], pg)
+
+
+print('{:>10} {:>10} {:>14} {:>14}'.format('size', 'neurons', 'rebuild (ms)', 'reset (ms)'))
+for size in [1, 10, 100, 1000, 10000]:
+    rebuild = []
+    for _ in range(n_repeats):
+        t_start = time.perf_counter()
+        worker = build(size)
+        nest.Prepare()
+        rebuild.append(time.perf_counter() - t_start)
+        nest.Cleanup()
+
+    nest.Prepare()
+    for _ in range(n_repeats):
+        nest.SetStatus(worker.generators, {'rate': max_rate / 2.})
+        nest.Run(100.)
+        worker.reset()
+    nest.Cleanup()
+
+    print('{:>10} {:>10} {:>14.1f} {:>14.1f}'.format(size, 3 * n_envs * size, np.median(rebuild) * 1e3, np.median(worker.overheads) * 1e3))
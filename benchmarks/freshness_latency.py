@@ -0,0 +1,68 @@
+#!/usr/bin/env python
+
+"""Compares the latency of a slow consumer with and without freshness policy.
+
+A publisher sends observations at 1 kHz while the consumer needs 5 ms
+per message. Without a policy, the backlog and hence the latency grow
+for the whole run; with conflation and a max-age cutoff the latency
+stays bounded by the processing time.
+
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+import zmq
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from nestrl import codec  # noqa: E402
+from nestrl.aio import AsyncReceiver  # noqa: E402
+from nestrl.freshness import Freshness  # noqa: E402
+from nestrl.latency import Histogram  # noqa: E402
+from nestrl.ticker import Ticker  # noqa: E402
+
+addr = 'tcp://127.0.0.1:5590'
+t_max = 2.  # s
+dt = 0.001  # s, publishing interval
+cost = 0.005  # s, processing time per message
+
+
+def publish(stop):
+    pub = zmq.Context.instance().socket(zmq.PUB)
+    pub.bind(addr)
+    time.sleep(0.2)  # let the subscriber connect
+    for _ in Ticker(dt, t_max):
+        codec.send(pub, codec.GymObservation(-1.2, 0.6, -0.9), 'binary')
+    stop.set()
+    pub.close()
+
+
+async def consume(receiver, histogram, stop):
+    while not stop.is_set():
+        for _, msg in await receiver.drain(timeout=0.1):
+            histogram.add(time.time() - msg['ts'].max())
+            time.sleep(cost)
+
+
+def measure(freshness):
+    receiver = AsyncReceiver(addr, freshness=freshness)
+    histogram = Histogram()
+    stop = threading.Event()
+    publisher = threading.Thread(target=publish, args=(stop,))
+    publisher.start()
+    asyncio.get_event_loop().run_until_complete(consume(receiver, histogram, stop))
+    publisher.join()
+    receiver.close()
+    return histogram
+
+
+print('{:>28} {:>10} {:>10} {:>10}'.format('policy', 'p50 (ms)', 'p99 (ms)', 'processed'))
+for name, freshness in [
+        ('none', None),
+        ('conflate', Freshness(conflate=True)),
+        ('conflate, max_age=10 ms', Freshness(conflate=True, max_age=0.01)),
+]:
+    histogram = measure(freshness)
+    print('{:>28} {:>10.2f} {:>10.2f} {:>10}'.format(name, histogram.percentile(50) * 1e3, histogram.percentile(99) * 1e3, histogram.n))
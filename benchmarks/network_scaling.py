@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+
+"""Measures how the cost of simulating the controller scales with population size.
+
+The MUSIC input proxy is replaced by a Poisson generator firing at the
+rate expected in the middle of the track, and the output proxy is
+omitted. For every population size, the wall-clock time per ms of
+biological time is reported; the toolchain runs at ``rtf=1.``, so
+anything above 1 ms/ms cannot keep up with MUSIC.
+
+"""
+
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from nestrl import network  # noqa: E402
+
+import nest  # noqa: E402
+
+max_rate = 50.  # 1/s
+resolution = 1.  # ms
+simtime = 1000.  # ms
+indegree = 100
+
+print('{:>10} {:>10} {:>14} {:>10}'.format('size', 'neurons', 'wall (ms/ms)', 'rtf ok'))
+for size in [1, 10, 100, 1000, 10000, 100000]:
+    nest.ResetKernel()
+    nest.set_verbosity('M_ERROR')
+    nest.SetKernelStatus({'resolution': resolution})
+
+    pg = nest.Create('poisson_generator', 1, {'rate': max_rate / 2.})
+    network.build_circuit(pg, size=size, indegree=indegree, max_rate=max_rate)
+
+    nest.Simulate(10.)  # exclude one-time preparation from the measurement
+    t_start = time.perf_counter()
+    nest.Simulate(simtime)
+    wall = (time.perf_counter() - t_start) * 1e3 / simtime
+
+    print('{:>10} {:>10} {:>14.4f} {:>10}'.format(size, 3 * size, wall, 'yes' if wall < 1. else 'no'))
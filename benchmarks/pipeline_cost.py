@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+
+"""Measures the per-tick cost of the in-process adapter pipeline.
+
+The stages are configured from the sections of ``example4/config.music``;
+the network is replaced by passing the encoder spikes on to the decoder.
+The readout replacing decoder and threshold is configured from the nest
+section of ``example4/config_readout.music``.
+
+"""
+
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from nestrl import codec, music_config  # noqa: E402
+from nestrl.pipeline import Pipeline, readout_from_section  # noqa: E402
+
+fname = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'example4', 'config.music')
+readout_fname = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'example4', 'config_readout.music')
+n_ticks = 1000
+
+for n_channels in [1, 10, 100, 1000, 10000]:
+    observation = Pipeline.from_config(fname, ['zmq_cont', 'encoder'])
+    command = Pipeline.from_config(fname, ['decoder', 'threshold', 'cont_zmq'])
+    readout = Pipeline(readout_from_section(music_config.read(readout_fname)[1]['nest']))
+
+    msg = codec.GymObservation(-1.2, 0.6, np.random.uniform(-1.2, 0.6, n_channels))
+    for _ in range(n_ticks):
+        counts = observation(msg)
+        command(counts)
+        readout(counts)
+
+    print('{} channels'.format(n_channels))
+    print(observation.report())
+    print(command.report())
+    print(readout.report())
@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+
+"""Reports the time to barrier of the NEST scripts of every example.
+
+Each script is started with ``--no-plot`` and the environment variable
+``NESTRL_STARTUP_PROBE`` set, which makes it exit at the barrier after
+printing the time since process start. For reference, the import
+times of the heavy modules are measured in fresh interpreters as well.
+
+"""
+
+import glob
+import os
+import subprocess
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from nestrl import startup  # noqa: E402
+
+root = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+n_repeats = 3
+
+
+def time_to_barrier(script):
+    """Returns the median time to barrier of `script` or an error message.
+
+    """
+    env = dict(os.environ, **{startup.PROBE: '1'})
+    samples = []
+    for _ in range(n_repeats):
+        proc = subprocess.run([sys.executable, os.path.basename(script), '--no-plot'], cwd=os.path.dirname(script),
+                              env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+        lines = [l for l in proc.stdout.splitlines() if l.startswith('time_to_barrier')]
+        if proc.returncode != 0 or not lines:
+            return (proc.stderr.strip().splitlines() or ['exit code {}'.format(proc.returncode)])[-1]
+        samples.append(float(lines[-1].split()[1]))
+    return '{:.3f} s'.format(np.median(samples))
+
+
+def import_time(module):
+    """Returns the time to import `module` in a fresh interpreter or an error message.
+
+    """
+    code = 'import time; t = time.perf_counter(); import {}; print(time.perf_counter() - t)'.format(module)
+    proc = subprocess.run([sys.executable, '-c', code], stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    if proc.returncode != 0:
+        return proc.stderr.strip().splitlines()[-1]
+    return '{:.3f} s'.format(float(proc.stdout))
+
+
+print('import times')
+for module in ['numpy', 'zmq', 'mpi4py.MPI', 'nest', 'matplotlib.pyplot']:
+    print('  {:20} {}'.format(module, import_time(module)))
+
+print('time to barrier')
+for script in sorted(glob.glob(os.path.join(root, 'example*', 'nest_sim*.py'))):
+    print('  {:30} {}'.format(os.path.relpath(script, root), time_to_barrier(script)))
@@ -0,0 +1,119 @@
+#!/usr/bin/env python
+
+"""Compares round-trip latency of the tcp, ipc and shm transports.
+
+A second process echoes every observation it receives on one address
+back on another, so every round trip consists of two hops, each with
+encoding, transport and decoding. Receivers spin (ZMQ: blocking
+``recv``, shm: busy polling), so the numbers are the best case on an
+idle machine.
+
+"""
+
+import multiprocessing
+import os
+import sys
+import time
+
+import numpy as np
+import zmq
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from nestrl import codec, shm  # noqa: E402
+from nestrl.transport import Sender  # noqa: E402
+
+ADDRESSES = [
+    ('tcp', 'tcp://127.0.0.1:5591', 'tcp://127.0.0.1:5592'),
+    ('ipc', 'ipc:///tmp/nestrl-benchmark-ping', 'ipc:///tmp/nestrl-benchmark-pong'),
+    ('shm', 'shm://nestrl-benchmark-ping', 'shm://nestrl-benchmark-pong'),
+]
+
+n_round_trips = 20000
+n_channels = 8
+
+
+class Receiver(object):
+    """Blocking receiver for either transport.
+
+    """
+
+    def __init__(self, addr):
+        if addr.startswith(shm.SCHEME):
+            self.ring = shm.RingReader(addr)
+        else:
+            self.ring = None
+            self.sock = zmq.Context.instance().socket(zmq.SUB)
+            self.sock.connect(addr)
+            self.sock.setsockopt(zmq.SUBSCRIBE, b'')
+
+    def recv(self, timeout=None):
+        if self.ring is not None:
+            return self.ring.recv(timeout)
+        if timeout is not None and not self.sock.poll(int(timeout * 1e3)):
+            return None
+        return codec.recv(self.sock)
+
+    def close(self):
+        if self.ring is not None:
+            self.ring.close()
+        else:
+            self.sock.close()
+
+
+def echo(ping, pong, ready):
+    tx = Sender(pong, n_channels)
+    ready.wait()
+    rx = Receiver(ping)
+    while True:
+        msg = rx.recv()
+        if msg['value'][0] < 0.:
+            break
+        tx.send(msg)
+    rx.close()
+    tx.close()
+
+
+def measure(ping, pong):
+    """Returns the round-trip times of `n_round_trips` observations in seconds.
+
+    """
+    ready = multiprocessing.Event()
+    tx = Sender(ping, n_channels)
+    child = multiprocessing.Process(target=echo, args=(ping, pong, ready))
+    child.start()
+    ready.set()
+    time.sleep(0.5)  # wait for the echo process to set up its sender
+    rx = Receiver(pong)
+
+    # PUB/SUB drops messages until the subscription arrived
+    msg = codec.GymObservation(0., 1., np.ones(n_channels))
+    while True:
+        tx.send(msg)
+        if rx.recv(timeout=0.1) is not None:
+            break
+    time.sleep(0.2)
+    while rx.recv(timeout=0.) is not None:
+        pass
+
+    rtts = np.empty(n_round_trips)
+    for i in range(n_round_trips):
+        t_start = time.perf_counter()
+        tx.send(msg)
+        rx.recv()
+        rtts[i] = time.perf_counter() - t_start
+
+    tx.send(codec.GymObservation(0., 1., -np.ones(n_channels)))
+    child.join()
+    rx.close()
+    tx.close()
+    return rtts
+
+
+if __name__ == '__main__':
+    multiprocessing.set_start_method('spawn')
+
+    print('{:>6} {:>16} {:>14} {:>14}'.format('', 'round trips/s', 'p50 (us)', 'p99 (us)'))
+    for name, ping, pong in ADDRESSES:
+        rtts = measure(ping, pong)
+        p50, p99 = np.percentile(rtts, [50, 99]) * 1e6
+        print('{:>6} {:>16.0f} {:>14.1f} {:>14.1f}'.format(name, n_round_trips / rtts.sum(), p50, p99))
@@ -1,31 +1,38 @@
 #!/usr/bin/env python
 
-import numpy as np
-import time
-import zmq
+import asyncio
+import os
+import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from nestrl.aio import AsyncReceiver  # noqa: E402
+from nestrl.freshness import Freshness  # noqa: E402
 
-ctx = zmq.Context()
 
-sub = ctx.socket(zmq.SUB)
-sub.connect('tcp://localhost:5556')
-sub.setsockopt(zmq.SUBSCRIBE, b'')
-
-# set timeout to avoid getting stuck when sender is not available
-sub.RCVTIMEO = 1000  # millisecond
+# drains all pending messages whenever the socket becomes readable, so
+# neither a backlog nor a silent sender stalls the loop; of a backlog
+# only the newest message is kept, and messages older than max_age are
+# dropped
+max_age = 0.1  # seconds
+freshness = Freshness(conflate=True, max_age=max_age)
+addr = 'tcp://localhost:5556'  # or the ipc:// or shm:// address of the sender
+receiver = AsyncReceiver(addr, freshness=freshness)
 
 t_max = 10.  # seconds
-dt = 0.01  # seconds
 
-print('start receiving')
 
-for t in np.arange(0, t_max, dt):
-    try:
-        msg = sub.recv_json()
-    except zmq.error.Again:  # timeout, try again
-        continue
+async def receive():
+    async for addr, msg in receiver:
+        print('recv', msg)
+
+
+print('start receiving')
 
-    print('recv', msg)
-    time.sleep(dt)
+loop = asyncio.get_event_loop()
+try:
+    loop.run_until_complete(asyncio.wait_for(receive(), t_max))
+except asyncio.TimeoutError:
+    pass
+receiver.close()
 
-print('stop receiving')
+print('stop receiving, received', receiver.n_received, 'messages,', freshness.summary())
@@ -1,32 +1,34 @@
 #!/usr/bin/env python
 
 import math
-import numpy as np
-import time
-import zmq
+import os
+import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from nestrl import codec  # noqa: E402
+from nestrl.ticker import Ticker  # noqa: E402
+from nestrl.transport import Sender  # noqa: E402
 
-def GymObservation(low, high, value):
-    """Converts value in range low high to the format of a GymObservation.
 
-    """
-    return [{'min': low, 'max': high, 'value': value, 'ts': time.time()}]
+# the transport is chosen by the scheme of the address (see
+# nestrl/transport.py): on a single host, 'ipc:///tmp/nestrl-5556' or
+# 'shm://nestrl-5556' avoid the TCP stack; the receiver needs to use the
+# same address
+addr = 'tcp://*:5556'
+fmt = 'binary'  # both ends are Python scripts, see nestrl/codec.py
 
-
-ctx = zmq.Context()
-
-pub = ctx.socket(zmq.PUB)
-pub.bind('tcp://*:5556')
+sender = Sender(addr, fmt=fmt)
 
 t_max = 10.  # seconds
 dt = 0.01  # seconds
 
 print('start sending')
 
-for t in np.arange(0, t_max, dt):
-    msg = GymObservation(-1., 1., math.sin(2 * math.pi * t))
+ticker = Ticker(dt, t_max)
+for t in ticker:
+    msg = codec.GymObservation(-1., 1., math.sin(2 * math.pi * t))
     print('send', msg)
-    pub.send_json(msg)
-    time.sleep(dt)
+    sender.send(msg)
+sender.close()
 
-print('stop sending')
+print('stop sending,', ticker.summary())
@@ -1,13 +1,21 @@
 #!/usr/bin/env python
 
-import matplotlib.pyplot as plt
 import nest
+import os
 import sys
 
 from mpi4py import MPI
 comm = MPI.COMM_WORLD
 
-simtime = 1500.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from nestrl import music_config, startup  # noqa: E402
+
+args = startup.parse_args(config='config_rate.music')
+
+# parameters shared with MUSIC are derived from its config, which is
+# checked for consistency before anything is set up
+config = music_config.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), args.config), resolution=1.)
+simtime = config.simtime  # ms
 
 # setup and simulate
 
@@ -22,11 +30,16 @@ m = nest.Create('multimeter', 1, {'record_from': ['rate']})
 nest.Connect(music_rate_in, neuron, syn_spec={'model': 'rate_connection_instantaneous', 'weight': 1.})
 nest.Connect(m, neuron)
 
-comm.Barrier()  # necessary to synchronize with MUSIC
+startup.barrier(comm)  # necessary to synchronize with MUSIC
 nest.Simulate(simtime)
 
 # plot results
 
+if args.no_plot:
+    sys.exit()
+
+import matplotlib.pyplot as plt  # noqa: E402, only imported when plotting
+
 events = nest.GetStatus(m, 'events')[0]
 
 fig = plt.figure()
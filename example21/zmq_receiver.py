@@ -2,9 +2,15 @@
 
 import matplotlib.pyplot as plt
 import numpy as np
-import time
+import os
+import sys
 import zmq
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from nestrl import driver  # noqa: E402
+from nestrl.history import RingRecorder, SummaryLogger  # noqa: E402
+from nestrl.ticker import Ticker  # noqa: E402
+
 
 ctx = zmq.Context()
 
@@ -12,26 +18,30 @@ sub = ctx.socket(zmq.SUB)
 sub.connect('tcp://localhost:5557')
 sub.setsockopt(zmq.SUBSCRIBE, b'')
 
-# set timeout to avoid getting stuck when sender is not available
-sub.RCVTIMEO = 2000  # millisecond
-
 t_max = 3.  # seconds
 dt = 0.01  # seconds
+n_channels = 1  # width of the cont_zmq adapter
 
 print('start receiving')
 
-times = []
-history = []
-for t in np.arange(0, t_max, dt):
-    try:
-        msg = sub.recv_json()
-    except zmq.error.Again:  # timeout, try again
+# the loop neither blocks, allocates nor prints, the history is saved
+# and summarized in background threads; ticks without a new message are
+# recorded as NaN, so a silent sender shows as a gap
+recorder = RingRecorder('zmq_history', n_channels)
+logger = SummaryLogger('recv')
+missing = np.full(n_channels, np.nan)
+ticker = Ticker(dt, t_max)
+for t in ticker:
+    msg = driver.latest(sub)  # newest pending message, JSON or binary
+    if msg is None:
+        recorder.record(t * 1e3, missing)
         continue
 
-    print('recv', msg)
-    times.append(t * 1e3)
-    history.append(msg[0]['value'])
-    time.sleep(dt)
+    logger.log(msg)
+    recorder.record(t * 1e3, msg['value'])
+recorder.close()
+logger.close()
+times, history = recorder.load()
 
 fig = plt.figure()
 ax = fig.add_subplot(111)
@@ -41,4 +51,4 @@ ax.set_ylabel('Low-pass filtered spikes (1/s)')
 ax.plot(times, history)
 fig.savefig('zmq_output.png', dpi=300)
 
-print('stop receiving')
+print('stop receiving,', ticker.summary())
@@ -1,13 +1,23 @@
 #!/usr/bin/env python
 
-import matplotlib.pyplot as plt
 import nest
+import os
 import sys
 
 from mpi4py import MPI
 comm = MPI.COMM_WORLD
 
-simtime = 3000.
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from nestrl import music_config, startup  # noqa: E402
+from nestrl.recording import Recording  # noqa: E402
+
+args = startup.parse_args()
+
+# parameters shared with MUSIC are derived from its config, which is
+# checked for consistency before anything is set up
+config = music_config.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), args.config))
+simtime = config.simtime  # ms
+chunk = 100.  # ms, recorded events are written to disk after each chunk
 
 # setup and simulate
 
@@ -31,31 +41,15 @@ nest.Connect(neuron, music_event_out)
 nest.Connect(neuron, dummy_neuron, syn_spec={'weight': 1.})
 nest.Connect(m_dummy, dummy_neuron)
 
-comm.Barrier()  # necessary to synchronize with MUSIC
-nest.Simulate(simtime)
-
-# plot results
-
-spikes = nest.GetStatus(sd, 'events')[0]
-vm = nest.GetStatus(m, 'events')[0]
-vm_dummy = nest.GetStatus(m_dummy, 'events')[0]
-
-fig = plt.figure()
-
-ax = fig.add_axes([0.15, 0.15, 0.3, 0.8])
-ax.set_xlabel('Time (ms)')
-ax.set_ylabel('Membrane potential (mV)')
-ax.set_xlim([0., simtime])
-ax.set_ylim([-70., -45.])
-
-ax_dummy = fig.add_axes([0.6, 0.15, 0.30, 0.8])
-ax_dummy.set_xlabel('Time (ms)')
-ax_dummy.set_ylabel('Low-pass filtered spikes (1/s)')
-
-ax.plot(spikes['times'], [-48.] * len(spikes['times']), ls='', marker='o', label='Spikes', markeredgewidth=0, markersize=3)
-ax.plot(vm['times'], vm['V_m'], 'k', label='Membrane potential (mV)')
-ax.legend(loc='upper right', fontsize=8)
+recording = Recording('recording', {
+    'spikes': (sd, ['times', 'senders']),
+    'vm': (m, ['times', 'V_m']),
+    'vm_dummy': (m_dummy, ['times', 'V_m']),
+})
 
-ax_dummy.plot(vm_dummy['times'], vm_dummy['V_m'])
+startup.barrier(comm)  # necessary to synchronize with MUSIC
+recording.simulate(simtime, chunk)
+recording.close()
 
-fig.savefig('nest_output.png', dpi=300)
+# plot results in a separate process, after MUSIC has finished:
+# $ PYTHONPATH=.. python -m nestrl.render recording -o nest_output.png
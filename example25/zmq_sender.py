@@ -2,15 +2,13 @@
 
 import math
 import numpy as np
-import time
+import os
+import sys
 import zmq
 
-
-def GymObservation(low, high, value):
-    """Converts value in range low high to the format of a GymObservation.
-
-    """
-    return [{'min': low, 'max': high, 'value': value, 'ts': time.time()}]
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from nestrl import codec  # noqa: E402
+from nestrl.ticker import Ticker  # noqa: E402
 
 
 ctx = zmq.Context()
@@ -20,13 +18,16 @@ pub.bind('tcp://*:5556')
 
 t_max = 10.
 dt = 0.01
+fmt = 'json'  # the zmq_cont_adapter only understands JSON
+seed = 12345  # of the noise, so every run sends the same values
 
 print('start sending')
 
-for t in np.arange(0, t_max, dt):
-    msg = GymObservation(-1., 1., math.sin(2 * math.pi * t) + np.random.normal(scale=0.1))
+rng = np.random.RandomState(seed)
+ticker = Ticker(dt, t_max)
+for t in ticker:
+    msg = codec.GymObservation(-1., 1., math.sin(2 * math.pi * t) + rng.normal(scale=0.1))
     print('send', msg)
-    pub.send_json(msg)
-    time.sleep(dt)
+    codec.send(pub, msg, fmt)
 
-print('stop sending')
+print('stop sending,', ticker.summary())
@@ -1,25 +1,24 @@
 #!/usr/bin/env python
 
-import matplotlib.pyplot as plt
 import nest
-import numpy as np
+import os
+import sys
 
 from mpi4py import MPI
 comm = MPI.COMM_WORLD
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from nestrl import music_config, startup  # noqa: E402
+from nestrl.network import get_current_offset  # noqa: E402
 
-def get_current_offset(weight, rate, tau_m, tau_syn, C_m):
-    """
-    Computes the mean input expected from an input with rate `rate`
-    and weight `weight` for a neuron with parameters `tau_m`,
-    `tau_syn` and `C_m` (see Campbell's theorem).
 
-    """
-    return weight / C_m * rate * tau_m * tau_syn * 1e-3
+args = startup.parse_args()
 
-
-simtime = 5000.  # needs to match the stoptime (here in ms) defined in the music config
-max_rate = 50.  # needs to match the max rate defined for the encoder in the music config
+# parameters shared with MUSIC are derived from its config, which is
+# checked for consistency before anything is set up
+config = music_config.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), args.config))
+simtime = config.simtime  # ms
+max_rate = config.max_rate()  # 1/s, rate_max of the encoder
 J = 250.
 
 # setup and simulate
@@ -55,12 +54,17 @@ nest.Connect(music_event_in, neuron_right, syn_spec={'weight': J})
 nest.Connect(neuron_left, sd)
 nest.Connect(neuron_right, sd)
 
-comm.Barrier()  # necessary to synchronize with MUSIC
+startup.barrier(comm)  # necessary to synchronize with MUSIC
 
 nest.Simulate(simtime)
 
 # plot results
 
+if args.no_plot:
+    sys.exit()
+
+import matplotlib.pyplot as plt  # noqa: E402, only imported when plotting
+
 spikes = nest.GetStatus(sd, 'events')[0]
 
 fig = plt.figure()
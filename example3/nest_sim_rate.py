@@ -1,14 +1,22 @@
 #!/usr/bin/env python
 
-import matplotlib.pyplot as plt
 import nest
-import numpy as np
+import os
+import sys
 
 from mpi4py import MPI
 comm = MPI.COMM_WORLD
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from nestrl import music_config, startup  # noqa: E402
 
-simtime = 5000.  # needs to match the stoptime (here in ms) defined in the music config
+
+args = startup.parse_args(config='config_rate.music')
+
+# parameters shared with MUSIC are derived from its config, which is
+# checked for consistency before anything is set up
+config = music_config.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), args.config), resolution=1.)
+simtime = config.simtime  # ms
 
 # setup and simulate
 
@@ -30,11 +38,16 @@ nest.Connect(music_rate_in, neuron_right, syn_spec={'model': 'rate_connection_in
 nest.Connect(m_left, neuron_left)
 nest.Connect(m_right, neuron_right)
 
-comm.Barrier()  # necessary to synchronize with MUSIC
+startup.barrier(comm)  # necessary to synchronize with MUSIC
 nest.Simulate(simtime)
 
 # plot results
 
+if args.no_plot:
+    sys.exit()
+
+import matplotlib.pyplot as plt  # noqa: E402, only imported when plotting
+
 events_left = nest.GetStatus(m_left, 'events')[0]
 events_right = nest.GetStatus(m_right, 'events')[0]
 
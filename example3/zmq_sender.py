@@ -1,14 +1,12 @@
 #!/usr/bin/env python
 
-import time
+import os
+import sys
 import zmq
 
-
-def GymObservation(low, high, value):
-    """Converts value in range low high to the format of a GymObservation.
-
-    """
-    return [{'min': low, 'max': high, 'value': value, 'ts': time.time()}]
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from nestrl import codec  # noqa: E402
+from nestrl.ticker import Ticker  # noqa: E402
 
 
 ctx = zmq.Context()
@@ -17,15 +15,13 @@ pub = ctx.socket(zmq.PUB)
 pub.bind('tcp://*:5556')
 
 t_max = 10.
-t = 0
 dt = 0.01
+fmt = 'json'  # the zmq_cont_adapter only understands JSON
 
 print('start sending')
 
-while t < t_max:
-    pub.send_json(GymObservation(-1.2, 0.6, -0.9))
-    time.sleep(dt)
-
-    t += dt
+ticker = Ticker(dt, t_max)
+for t in ticker:
+    codec.send(pub, codec.GymObservation(-1.2, 0.6, -0.9), fmt)
 
-print('stop sending')
+print('stop sending,', ticker.summary())
@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+
+import nest
+import os
+import sys
+
+import zmq
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from nestrl import codec, driver, music_config, network, pipeline, startup  # noqa: E402
+from nestrl.freshness import Freshness  # noqa: E402
+from nestrl.profiler import Profiler, Tap  # noqa: E402
+from nestrl.recording import Recording  # noqa: E402
+from nestrl.ticker import Ticker  # noqa: E402
+
+
+# runs the closed loop of config.music in a single process without MUSIC
+# and MPI: observations are read from gymz via ZMQ, injected into the
+# network every music_timestep and the decoded commands are sent back;
+# all parameters, including the ZMQ addresses, are taken from the
+# sections of the MUSIC config
+args = startup.parse_args()
+
+config = music_config.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), args.config))
+simtime = config.simtime  # ms
+resolution = config.resolution()  # ms, music_timestep of the adapters
+sections = config.sections
+encoder = sections['encoder']
+n_envs = config.width('nest', 'in')
+
+input_type = 'spike'  # 'poisson', 'spike' (regular, as the rate_encoder) or 'current'
+chunk = 100.  # ms, recorded events are written to disk after each chunk
+seed = 12345
+
+population_size = 1  # neurons per role (left, right, command) and environment
+indegree = 10  # inputs a command neuron receives from each of the left and right populations
+
+tau_m = args.params.get('tau_m', 1.)
+tau_syn = args.params.get('tau_syn', 20.)
+J = args.params.get('J', 200.)
+
+rate_min = encoder.get('rate_min', 0., float)
+rate_max = encoder.get('rate_max', 100., float)
+
+# setup
+
+nest.ResetKernel()
+nest.set_verbosity('M_ERROR')
+
+nest.SetKernelStatus({
+    'resolution': resolution,
+    'local_num_threads': int(args.threads),
+    'grng_seed': seed,
+    'rng_seeds': [seed + 1 + i for i in range(int(args.threads))],
+})
+
+if input_type == 'poisson':
+    generators = nest.Create('poisson_generator', n_envs)
+    inputs = driver.PoissonInput(generators, rate_min, rate_max)
+elif input_type == 'spike':
+    generators = nest.Create('spike_generator', n_envs)
+    inputs = driver.SpikeInput(generators, pipeline.from_section(encoder.params))
+elif input_type == 'current':
+    generators = nest.Create('step_current_generator', n_envs)
+    inputs = driver.CurrentInput(generators, rate_min, rate_max, tau_syn, resolution)
+else:
+    raise ValueError('unknown input type {!r}'.format(input_type))
+
+circuit = network.build_circuit(generators, None, population_size, indegree, J, tau_m, tau_syn, rate_max)
+
+sd_command = nest.Create('spike_detector')
+for population in circuit.command:
+    nest.Connect(population, sd_command)
+
+sd = nest.Create('spike_detector')
+for populations in circuit:
+    for population in populations:
+        nest.Connect(population, sd)
+
+mv = nest.Create('multimeter', 1, {'record_from': ['V_m']})
+nest.Connect(mv, [population[0] for populations in circuit for population in populations])
+
+recording = Recording('recording', {
+    'spikes': (sd, ['times', 'senders']),
+    'vm': (mv, ['times', 'senders', 'V_m']),
+})
+
+# with --profile, the hop from gymz, every stage of the loop body and
+# nest.Run are written as Chrome trace
+profiler = Profiler('nest_direct', enabled=args.profile is not None)
+tap = Tap(profiler, 'gym')
+
+# the decoder, threshold and cont_zmq sections, or the readout of the
+# nest section (see config_readout.music)
+decoder = pipeline.Pipeline(pipeline.command_stages({name: section.params for name, section in sections.items()}), profiler)
+cmd_addr = sections['nest'].get('zmq_addr') if 'readout_window' in sections['nest'].params else sections['cont_zmq'].get('zmq_addr')
+loop = driver.Driver(inputs, driver.SpikeCounter(sd_command, circuit.command), decoder, resolution * 1e-3, profiler)
+
+# only the newest observation is of interest
+ctx = zmq.Context()
+sub = ctx.socket(zmq.SUB)
+Freshness(conflate=True).configure(sub)
+sub.connect(sections['zmq_cont'].get('zmq_addr'))
+sub.setsockopt(zmq.SUBSCRIBE, sections['zmq_cont'].get('zmq_topic', '').encode())
+pub = ctx.socket(zmq.PUB)
+pub.bind(cmd_addr)
+
+# simulate in real time, like MUSIC with rtf=1.
+
+per_chunk = int(round(chunk / resolution))
+
+print('start simulating')
+
+nest.Prepare()
+ticker = Ticker(resolution * 1e-3, simtime * 1e-3, skip_missed=False)
+for k, _ in enumerate(ticker):
+    with profiler.span('recv'):
+        obs = tap(driver.latest(sub))
+    command = loop.step(obs)
+    with profiler.span('send'):
+        codec.send(pub, command, 'json', codec.COMMAND)
+    if (k + 1) % per_chunk == 0:
+        with profiler.span('drain'):
+            recording.drain()
+recording.drain()
+nest.Cleanup()
+recording.close()
+
+print('stop simulating,', ticker.summary())
+print(decoder.report())
+if args.profile is not None:
+    profiler.write(args.profile)
+    print(profiler.report())
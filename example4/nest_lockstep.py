@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+import argparse
+import nest
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from nestrl import lockstep, mountaincar, music_config, network, pipeline, startup  # noqa: E402
+from nestrl.worker import Worker  # noqa: E402
+
+
+# runs the controller of nest_sim.py without MUSIC; the adapters are
+# replaced by the stages of nestrl.pipeline configured from the same
+# MUSIC config, and every observation received from the environment
+# (python -m nestrl.mountaincar --lockstep) advances the network by one
+# environment step; the network is built once and serves --episodes
+# episodes, its state is reset in between
+args = startup.parse_args()
+parser = argparse.ArgumentParser()
+parser.add_argument('--episodes', type=int, default=1, help='episodes to serve, as many as the environment runs')
+parser.add_argument('--gym-config', default='gym_config.json', help='gymz config of the environment, relative to the script')
+lockstep_args, _ = parser.parse_known_args()
+
+config = music_config.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), args.config))
+resolution = config.resolution()  # ms, music_timestep of the adapters
+max_rate = config.max_rate()  # 1/s, rate_max of the encoder
+n_envs = config.width('nest', 'in')
+
+# s, environment time per observation, the update_interval of the environment
+step = mountaincar.read_config(os.path.join(os.path.dirname(os.path.abspath(__file__)), lockstep_args.gym_config))['update_interval']
+addr = 'tcp://*:5557'
+n_episodes = lockstep_args.episodes
+seed = 12345
+
+population_size = 1  # neurons per role (left, right, command) and environment
+indegree = 10  # inputs a command neuron receives from each of the left and right populations
+
+tau_m = args.params.get('tau_m', 1.)
+tau_syn = args.params.get('tau_syn', 20.)
+J = args.params.get('J', 200.)
+
+# setup
+
+nest.ResetKernel()
+nest.set_verbosity('M_ERROR')
+
+nest.SetKernelStatus({
+    'resolution': resolution,
+    'local_num_threads': int(args.threads),
+    'grng_seed': seed,
+    'rng_seeds': [seed + 1 + i for i in range(int(args.threads))],
+})
+
+generators = nest.Create('spike_generator', n_envs)
+
+circuit = network.build_circuit(generators, None, population_size, indegree, J, tau_m, tau_syn, max_rate)
+
+sd = nest.Create('spike_detector')
+for population in circuit.command:
+    nest.Connect(population, sd)
+
+sections = config.sections
+encoder = pipeline.Pipeline([(name, pipeline.from_section(sections[name].params)) for name in ['zmq_cont', 'encoder']])
+decoder = pipeline.Pipeline(pipeline.command_stages({name: section.params for name, section in sections.items()}))
+
+controller = lockstep.Controller(generators, sd, circuit.command, encoder, decoder, resolution * 1e-3, step)
+
+neurons = sum(circuit.left + circuit.right + circuit.command, ())
+worker = Worker(neurons, [sd], generators, [controller])
+
+# simulate, one step per request; the episodes share the network
+
+
+def end(n_steps):
+    print('served {} steps, {:.0f} ms of biological time'.format(n_steps, controller.t))
+    worker.reset()
+
+
+print('serving on', addr)
+
+nest.Prepare()
+lockstep.serve(addr, controller, n_episodes=n_episodes, end=end)
+nest.Cleanup()
+
+print(worker.summary())
+print(encoder.report())
+print(decoder.report())
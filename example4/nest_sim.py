@@ -1,51 +1,68 @@
 #!/usr/bin/env python
 
-import matplotlib.pyplot as plt
 import nest
-import numpy as np
+import os
+import sys
 
 from mpi4py import MPI
 comm = MPI.COMM_WORLD
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from nestrl import music_config, network, pipeline, startup  # noqa: E402
+from nestrl.profiler import Profiler  # noqa: E402
+from nestrl.recording import Recording  # noqa: E402
+from nestrl.spikes import CommandPublisher, SpikePublisher  # noqa: E402
+from nestrl.transport import Sender  # noqa: E402
 
-def get_current_offset(weight, rate, tau_m, tau_syn, C_m):
-    """
-    Computes the mean input expected from an input with rate `rate`
-    and weight `weight` for a neuron with parameters `tau_m`,
-    `tau_syn` and `C_m` (see Campbell's theorem).
 
-    """
-    return weight / C_m * rate * tau_m * tau_syn * 1e-3
+args = startup.parse_args()
 
+# parameters shared with MUSIC are derived from its config, which is
+# checked for consistency before anything is set up
+config = music_config.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), args.config))
+simtime = config.simtime  # ms
+resolution = config.resolution()  # ms, music_timestep of the adapters
+max_rate = config.max_rate()  # 1/s, rate_max of the encoder
 
-simtime = 10000.  # needs to match the stoptime (here in ms) defined in the music config
-max_rate = 50.  # needs to match the max rate defined for the encoder in the music config
+# one copy of the circuit per environment, each environment uses one
+# channel of the input and output ports (see config_batch.music); without
+# an output port, commands are decoded from the spikes published with
+# --spikes (see config_spikes.music) or, if the nest section configures
+# a readout, within this process (see config_readout.music)
+n_envs = config.width('nest', 'in')
+has_out = len(config.outputs('nest')) > 0
+has_readout = 'readout_window' in config.sections['nest'].params
+if has_out and config.width('nest', 'out') != n_envs:
+    raise music_config.ConfigError('nest.in and nest.out need the same width')
 
-tau_m = 1.
-tau_syn = 20.
-J = 200.
+chunk = 100.  # ms, recorded events are written to disk after each chunk
 
-# setup and simulate
+population_size = 1  # neurons per role (left, right, command) and environment
+indegree = 10  # inputs a command neuron receives from each of the left and right populations
 
-nest.ResetKernel()
+tau_m = args.params.get('tau_m', 1.)
+tau_syn = args.params.get('tau_syn', 20.)
+J = args.params.get('J', 200.)
 
-nest.SetKernelStatus({'resolution': 1.})
+# the number of threads per rank is set by --threads (see
+# python -m nestrl.parallel to choose it), the number of ranks by np in
+# the nest section of the MUSIC config
+n_threads = int(args.threads)
 
-C_m = nest.GetDefaults('iaf_psc_exp', 'C_m')
+# setup and simulate
 
-music_in_proxy = nest.Create('music_event_in_proxy', 1, {'port_name': 'in'})
-music_out_proxy = nest.Create('music_event_out_proxy', 1, {'port_name': 'out'})
+nest.ResetKernel()
 
-neuron_left = nest.Create('iaf_psc_exp', 1, {
-    'E_L': -60.3 + get_current_offset(J, max_rate / 2., tau_m, tau_syn, C_m),  # add additional 0.3mV to make the left neuron a bit less excitable
-    'V_th': -60., 'tau_m': tau_m, 'tau_syn_ex': tau_syn, 'tau_syn_in': tau_syn, 'C_m': C_m
-})
-neuron_right = nest.Create('iaf_psc_exp', 1, {
-    'E_L': -60. + get_current_offset(-J, max_rate / 2., tau_m, tau_syn, C_m),
-    'V_th': -60., 'tau_m': tau_m, 'tau_syn_ex': tau_syn, 'tau_syn_in': tau_syn, 'C_m': C_m
-})
+nest.SetKernelStatus({'resolution': resolution, 'local_num_threads': n_threads})
+
+# MUSIC proxies exist on every rank: each input proxy delivers the spikes of
+# its channel to the local neurons and the output proxy publishes the
+# spikes of the local command neurons on their channels
+music_in_proxy = nest.Create('music_event_in_proxy', n_envs, {'port_name': 'in'})
+nest.SetStatus(music_in_proxy, [{'music_channel': i} for i in range(n_envs)])
+music_out_proxy = nest.Create('music_event_out_proxy', 1, {'port_name': 'out'}) if has_out else None
 
-neuron_command = nest.Create('iaf_psc_exp', 1, {'E_L': -60., 'V_th': -60., 'tau_m': 10 * tau_m, 'tau_syn_ex': tau_syn, 'tau_syn_in': tau_syn})
+circuit = network.build_circuit(music_in_proxy, music_out_proxy, population_size, indegree, J, tau_m, tau_syn, max_rate)
 
 sd = nest.Create('spike_detector')
 
@@ -53,52 +70,63 @@ mv_left = nest.Create('multimeter', 1, {'record_from': ['V_m']})
 mv_right = nest.Create('multimeter', 1, {'record_from': ['V_m']})
 mv_command = nest.Create('multimeter', 1, {'record_from': ['V_m']})
 
-nest.Connect(music_in_proxy, neuron_left, syn_spec={'weight': -J})
-nest.Connect(music_in_proxy, neuron_right, syn_spec={'weight': J})
-
-nest.Connect(neuron_left, neuron_command, syn_spec={'weight': J})
-nest.Connect(neuron_right, neuron_command, syn_spec={'weight': -J})
-
-nest.Connect(neuron_command, music_out_proxy)
-
-nest.Connect(neuron_left, sd)
-nest.Connect(neuron_right, sd)
-nest.Connect(neuron_command, sd)
+for populations in circuit:
+    for population in populations:
+        nest.Connect(population, sd)
 
-nest.Connect(mv_left, neuron_left)
-nest.Connect(mv_right, neuron_right)
-nest.Connect(mv_command, neuron_command)
+# record the membrane potential of one neuron per population
+nest.Connect(mv_left, [population[0] for population in circuit.left])
+nest.Connect(mv_right, [population[0] for population in circuit.right])
+nest.Connect(mv_command, [population[0] for population in circuit.command])
 
-comm.Barrier()  # necessary to synchronize with MUSIC
-nest.Simulate(simtime)
-
-# plot results
-
-spikes = nest.GetStatus(sd, 'events')[0]
-
-fig = plt.figure()
-ax = fig.add_subplot(211)
-ax.set_xlim([0., simtime])
-ax.set_ylim([neuron_left[0] - 1, neuron_command[0] + 1])
-ax.set_yticks([neuron_left[0], neuron_right[0], neuron_command[0]])
-ax.set_yticklabels(['Left', 'Right', 'Command'])
-
-ax.plot(spikes['times'], spikes['senders'], 'ko')
-
-ax2 = fig.add_subplot(212)
-ax2.set_xlabel('Time (ms)')
-ax2.set_ylabel('Membrane potential (mV)')
-
-vm_left = nest.GetStatus(mv_left, 'events')[0]
-vm_right = nest.GetStatus(mv_right, 'events')[0]
-vm_command = nest.GetStatus(mv_command, 'events')[0]
-
-ax2.plot(vm_left['times'], vm_left['V_m'], 'r', label='left')
-ax2.axhline(np.mean(vm_left['V_m'][100:]), lw=2, color='r')
-ax2.plot(vm_right['times'], vm_right['V_m'], 'b', label='right')
-ax2.axhline(np.mean(vm_right['V_m'][100:]), lw=2, color='b')
-ax2.plot(vm_command['times'], vm_command['V_m'], 'm', label='command')
-
-plt.legend()
+recording = Recording('recording', {
+    'spikes': (sd, ['times', 'senders']),
+    'vm_left': (mv_left, ['times', 'senders', 'V_m']),
+    'vm_right': (mv_right, ['times', 'senders', 'V_m']),
+    'vm_command': (mv_command, ['times', 'senders', 'V_m']),
+})
 
-fig.savefig('nest_output.png', dpi=300)
+# send the spikes of the command neurons after every MUSIC timestep
+# (single rank only, every rank would bind the same address)
+publishers = []
+if args.spikes:
+    sd_command = nest.Create('spike_detector')
+    for population in circuit.command:
+        nest.Connect(population, sd_command)
+    publishers.append(SpikePublisher(sd_command, circuit.command, Sender(args.spikes)))
+
+# decode the command neurons into actions and send them to gymz after
+# every MUSIC timestep, instead of linear_decoder, threshold_adapter and
+# cont_zmq_adapter (single rank only, the others miss remote spikes)
+if has_readout:
+    if nest.NumProcesses() > 1:
+        sys.exit('the readout needs all command neurons on a single NEST rank')
+    nest_section = config.sections['nest']
+    sd_readout = nest.Create('spike_detector')
+    for population in circuit.command:
+        nest.Connect(population, sd_readout)
+    decoder = pipeline.Pipeline(pipeline.readout_from_section(nest_section.params))
+    publishers.append(CommandPublisher(sd_readout, circuit.command, decoder, Sender(nest_section.get('zmq_addr'), fmt='json')))
+
+
+def publish():
+    for publisher in publishers:
+        publisher()
+
+
+# with --profile, the time spent in nest.Run, publishing and draining
+# is written as Chrome trace, one file per rank
+profiler = Profiler('nest_sim rank {}'.format(nest.Rank()), enabled=args.profile is not None)
+
+startup.barrier(comm)  # necessary to synchronize with MUSIC
+recording.simulate(simtime, chunk, publish if publishers else None, resolution, profiler)
+recording.close()
+for publisher in publishers:
+    publisher.sender.close()
+if args.profile is not None:
+    root, ext = os.path.splitext(args.profile)
+    profiler.write(args.profile if nest.Rank() == 0 else '{}.rank{}{}'.format(root, nest.Rank(), ext))
+    print(profiler.report())
+
+# plot results in a separate process, after MUSIC has finished:
+# $ PYTHONPATH=.. python -m nestrl.render recording -o nest_output.png --labels Left,Right,Command
@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+
+import asyncio
+import os
+import sys
+
+import numpy as np
+import zmq
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from nestrl import codec, music_config, startup  # noqa: E402
+from nestrl.aio import AsyncReceiver  # noqa: E402
+from nestrl.spikes import WindowedCounts  # noqa: E402
+
+
+# replaces linear_decoder, threshold_adapter and cont_zmq_adapter of
+# config.music: decodes the spikes published by nest_sim.py --spikes
+# (see config_spikes.music) and sends commands to gymz
+args = startup.parse_args(config='config_spikes.music')
+
+config = music_config.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), args.config))
+n_envs = config.width('nest', 'in')
+resolution = config.resolution()  # ms
+
+window = 20.  # ms, spikes within the window are counted
+threshold = 1.  # 1/s, rates above are interpreted as "accelerate right"
+scale = 2.  # command for rates above threshold
+
+receiver = AsyncReceiver('tcp://localhost:5558')
+
+ctx = zmq.Context()
+pub = ctx.socket(zmq.PUB)
+pub.bind('tcp://*:5555')
+
+decoder = WindowedCounts(n_envs, window, resolution)
+
+t_max = 10.  # seconds
+
+
+async def decode():
+    async for _, batch in receiver:
+        decoder(batch)
+        command = scale * (decoder.rate() > threshold)
+        codec.send(pub, codec.GymCommand(0., scale, command), 'json', codec.COMMAND)
+
+
+print('start decoding')
+
+loop = asyncio.get_event_loop()
+try:
+    loop.run_until_complete(asyncio.wait_for(decode(), t_max))
+except asyncio.TimeoutError:
+    pass
+receiver.close()
+
+print('stop decoding, received', receiver.n_received, 'batches, last rates', np.round(decoder.rate(), 1))
@@ -1,33 +1,48 @@
 #!/usr/bin/env python
 
-import json
-import time
-import zmq
+import asyncio
+import os
+import sys
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from nestrl.aio import AsyncReceiver  # noqa: E402
+from nestrl.freshness import Freshness  # noqa: E402
+from nestrl.latency import LatencyRecorder  # noqa: E402
 
-ctx = zmq.Context()
 
-sub = ctx.socket(zmq.SUB)
-sub.connect('tcp://localhost:5555')
-sub.setsockopt(zmq.SUBSCRIBE, b'')
-sub.RCVTIMEO = 1000  # set timeout to avoid getting stuck when sender is not available
+# observations published by gymz and commands published by the
+# cont_zmq_adapter; both are monitored to record the latency per hop
+hops = [('gym', 'tcp://localhost:5556'), ('cont_zmq', 'tcp://localhost:5555')]
+names = {addr: name for name, addr in hops}
 
-t_max = 10.
-t = 0
-dt = 0.01
+# drains all pending messages whenever a socket becomes readable, so
+# neither a backlog nor a silent sender stalls the loop; of a backlog
+# only the newest observation and command are kept, and messages older
+# than max_age are dropped (and hence not included in the latencies)
+max_age = 0.1  # seconds
+freshness = Freshness(conflate=True, max_age=max_age)
+receiver = AsyncReceiver([addr for _, addr in hops], freshness=freshness)
+latency = LatencyRecorder([name for name, _ in hops])
+
+t_max = 10.  # seconds
 
-print('start receiving')
 
-while t < t_max:
+async def receive():
+    async for addr, msg in receiver:
+        latency.record(names[addr], msg)
+        if names[addr] == 'cont_zmq':
+            print(msg)
 
-    try:
-        msg = sub.recv_json()
-    except zmq.error.Again:  # timeout, try again
-        continue
 
-    print(msg)
-    time.sleep(dt)
+print('start receiving')
 
-    t += dt
+loop = asyncio.get_event_loop()
+try:
+    loop.run_until_complete(asyncio.wait_for(receive(), t_max))
+except asyncio.TimeoutError:
+    pass
+receiver.close()
 
-print('stop sending')
+print('stop receiving, received', receiver.n_received, 'messages,', freshness.summary())
+print(latency.report())
+latency.write('latency.json')
@@ -1,31 +1,45 @@
 #!/usr/bin/env python
 
-import time
+import os
+import sys
 import zmq
 
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir))
+from nestrl import codec, music_config, startup  # noqa: E402
+from nestrl.freshness import Freshness  # noqa: E402
+from nestrl.profiler import Profiler  # noqa: E402
+from nestrl.ticker import Ticker  # noqa: E402
 
-def GymObservation(low, high, value):
-    """Converts value in range low high to the format of a GymObservation.
 
-    """
-    return [{'min': low, 'max': high, 'value': value, 'ts': time.time()}]
+args = startup.parse_args()
 
+# one observation channel per environment, as many as the zmq_cont_adapter
+# sends on (e.g. eight with config_batch.music)
+config = music_config.load(os.path.join(os.path.dirname(os.path.abspath(__file__)), args.config))
+n_envs = config.width('zmq_cont', 'out')
 
 ctx = zmq.Context()
 
+# a slow subscriber only gets the newest observation instead of a backlog
 pub = ctx.socket(zmq.PUB)
+Freshness(conflate=True).configure(pub)
 pub.bind('tcp://*:5556')
 
 t_max = 10.
-t = 0
 dt = 0.01
+fmt = 'json'  # the zmq_cont_adapter only understands JSON
 
-print('start sending')
+# with --profile, the time spent in the loop body is written as Chrome trace
+profiler = Profiler('zmq_sender', enabled=args.profile is not None)
 
-while t < t_max:
-    pub.send_json(GymObservation(-1.2, 0.6, -0.9))
-    time.sleep(dt)
+print('start sending')
 
-    t += dt
+ticker = Ticker(dt, t_max)
+for t in ticker:
+    with profiler.span('send'):
+        codec.send(pub, codec.GymObservation(-1.2, 0.6, [-0.9] * n_envs), fmt)
 
-print('stop sending')
+print('stop sending,', ticker.summary())
+if args.profile is not None:
+    profiler.write(args.profile)
+    print(profiler.report())
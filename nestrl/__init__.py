@@ -0,0 +1,6 @@
+"""Shared helpers for the NEST <-> OpenAI Gym tutorial examples.
+
+The example scripts add the repository root to ``sys.path`` so that
+this package can be imported without installing it.
+
+"""
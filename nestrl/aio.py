@@ -0,0 +1,134 @@
+"""Asynchronous receiving of messages from one or more publishers.
+
+Blocking in ``recv_json`` with a receive timeout and sleeping after
+every message lets a backlog grow by one message per tick and stalls
+the loop whenever a sender is silent. `AsyncReceiver` instead waits on
+all subscribed sockets at once with a ``zmq.asyncio`` poller and, once
+any of them is readable, drains every pending message without
+blocking. Shared memory rings (``shm://`` addresses, see `nestrl.shm`)
+cannot be polled by ZMQ and are checked every `RING_INTERVAL` seconds
+while waiting.
+
+Example::
+
+    receiver = AsyncReceiver(['tcp://localhost:5555', 'tcp://localhost:5557'])
+
+    async def consume():
+        async for addr, msg in receiver:
+            print(addr, msg[0]['value'])
+
+    asyncio.get_event_loop().run_until_complete(consume())
+
+"""
+
+import collections
+import time
+
+import zmq
+import zmq.asyncio
+
+from . import codec
+from . import shm
+from . import topics
+
+RING_INTERVAL = 0.001  # seconds
+
+
+class AsyncReceiver(object):
+    """Subscribes to `addresses` and yields `(address, msg)` asynchronously.
+
+    Messages are decoded with `codec.decode`, so publishers may use
+    either wire format. By default, all messages are received and no
+    topic frames are expected. For publishers sending topic frames,
+    `topic` is one topic prefix or a list of them (see
+    `nestrl.topics.subscribe`, ``b''`` for all topics); messages are
+    then yielded under the address `nestrl.topics.source(addr, topic)`,
+    so every stream is conflated separately. With a `freshness` policy
+    (`nestrl.freshness.Freshness`), stale messages are dropped and
+    backlogs conflated before they are yielded. Iteration ends once
+    `close` has been called.
+
+    """
+
+    def __init__(self, addresses, topic=None, ctx=None, freshness=None):
+        if isinstance(addresses, str):
+            addresses = [addresses]
+        self.ctx = zmq.asyncio.Context.instance() if ctx is None else ctx
+        self.freshness = freshness
+        self.poller = zmq.asyncio.Poller()
+        self.sockets = collections.OrderedDict()
+        self.rings = collections.OrderedDict()
+        for addr in addresses:
+            if addr.startswith(shm.SCHEME):
+                self.rings[shm.RingReader(addr)] = addr
+                continue
+            sock = self.ctx.socket(zmq.SUB)
+            if freshness is not None:
+                freshness.configure(sock, multipart=topic is not None)
+            sock.connect(addr)
+            topics.subscribe(sock, b'' if topic is None else topic)
+            self.poller.register(sock, zmq.POLLIN)
+            self.sockets[sock] = addr
+
+        self._pending = collections.deque()
+        self.closed = False
+        self.n_received = 0
+
+    async def drain(self, timeout=None):
+        """Waits up to `timeout` seconds for messages and returns all pending ones.
+
+        Returns a (possibly empty) list of `(address, msg)`. With
+        `timeout=None` it waits until at least one message arrived.
+
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            poll_timeout = timeout
+            if self.rings:
+                poll_timeout = RING_INTERVAL if deadline is None else max(0., min(RING_INTERVAL, deadline - time.monotonic()))
+            events = await self.poller.poll(None if poll_timeout is None else int(poll_timeout * 1e3))
+
+            messages = []
+            for sock, _ in events:
+                addr = self.sockets[sock]
+                while True:
+                    try:
+                        frame = await sock.recv(zmq.NOBLOCK, copy=False)
+                    except zmq.error.Again:
+                        break
+                    if frame.more:
+                        stream = topics.source(addr, frame.bytes)
+                        frame = await sock.recv(copy=False)
+                    else:
+                        stream = addr
+                    messages.append((stream, codec.decode(frame.buffer)))
+            for ring, addr in self.rings.items():
+                messages.extend((addr, msg) for msg in ring.drain())
+
+            if messages or not self.rings or (deadline is not None and time.monotonic() >= deadline):
+                break
+        self.n_received += len(messages)
+        if self.freshness is not None:
+            messages = self.freshness.filter(messages)
+        return messages
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        while not self._pending:
+            if self.closed:
+                raise StopAsyncIteration
+            self._pending.extend(await self.drain(timeout=0.1))
+        return self._pending.popleft()
+
+    def close(self):
+        """Stops iteration and closes all sockets.
+
+        """
+        self.closed = True
+        for sock in self.sockets:
+            self.poller.unregister(sock)
+            sock.close(linger=0)
+        for ring in self.rings:
+            ring.close()
@@ -0,0 +1,235 @@
+"""Wire formats for GymObservation/GymCommand messages.
+
+Two formats are supported:
+
+- ``'json'``: the list-of-dicts format understood by gymz and the
+  MUSIC ``zmq_cont_adapter``/``cont_zmq_adapter``, e.g.
+  ``[{'min': -2, 'max': 1, 'value': 0.1, 'ts': 1508443240.706507}]``
+- ``'binary'``: a packed frame consisting of a fixed 8 byte header
+  (magic, version, message type, number of channels) followed by one
+  float64 record (min, max, value, ts) per channel; it is sent without
+  copying and decoded with ``np.frombuffer``
+
+Independent of the wire format, messages are represented in Python as
+structured arrays with dtype ``CHANNEL_DTYPE``, so ``msg[0]['value']``
+works as it does for the JSON format.
+
+The binary format is only understood by Python processes using this
+module; components talking to the MUSIC adapters need to use JSON.
+
+Besides observations and commands, the binary format carries raw spike
+batches (message type ``SPIKES``): the same header, followed by the
+start and end of the batch (float64, in ms) and the packed arrays of
+spike times (float64, in ms) and channel ids (uint32). In Python they
+are represented as `SpikeBatch`. A single frame can carry the spikes of
+thousands of channels, without smoothing them into rates first.
+
+In either format, a message may be preceded by a frame holding its
+topic, so that several streams can share one socket (see
+`nestrl.topics`).
+
+"""
+
+import collections
+import json
+import struct
+import time
+
+import numpy as np
+import zmq
+
+CHANNEL_DTYPE = np.dtype([('min', '<f8'), ('max', '<f8'), ('value', '<f8'), ('ts', '<f8')])
+
+OBSERVATION = 0
+COMMAND = 1
+SPIKES = 2
+
+MAGIC = b'NR'
+VERSION = 1
+HEADER = struct.Struct('<2sBBI')  # magic, version, message type, number of channels
+
+SPIKE_HEADER = struct.Struct('<dd')  # start and end of the batch in ms
+
+FORMATS = ('json', 'binary')
+
+SpikeBatch = collections.namedtuple('SpikeBatch', ['t_start', 't_stop', 'times', 'channels'])
+
+
+def GymObservation(low, high, value, ts=None):
+    """Converts value(s) in range low high to the format of a GymObservation.
+
+    All arguments can be scalars or arrays (one entry per channel).
+
+    """
+    value = np.atleast_1d(value)
+    msg = np.empty(len(value), dtype=CHANNEL_DTYPE)
+    msg['min'] = low
+    msg['max'] = high
+    msg['value'] = value
+    msg['ts'] = time.time() if ts is None else ts
+    return msg
+
+
+def GymCommand(low, high, value, ts=None):
+    """Converts value(s) in range low high to the format of a GymCommand.
+
+    """
+    return GymObservation(low, high, value, ts)
+
+
+def frame_size(n):
+    """Returns the size in bytes of a binary frame with `n` channels.
+
+    """
+    return HEADER.size + n * CHANNEL_DTYPE.itemsize
+
+
+def spike_frame_size(n):
+    """Returns the size in bytes of a spike batch frame with `n` spikes.
+
+    """
+    return HEADER.size + SPIKE_HEADER.size + n * 12
+
+
+def encode_spikes(batch, out=None):
+    """Packs a `SpikeBatch` into a binary frame.
+
+    `out` is used as in `encode_binary`. Returns the frame as a
+    memoryview.
+
+    """
+    n = len(batch.times)
+    if out is None:
+        out = bytearray(spike_frame_size(n))
+    buf = memoryview(out)[:spike_frame_size(n)]
+    HEADER.pack_into(buf, 0, MAGIC, VERSION, SPIKES, n)
+    SPIKE_HEADER.pack_into(buf, HEADER.size, batch.t_start, batch.t_stop)
+    offset = HEADER.size + SPIKE_HEADER.size
+    np.frombuffer(buf, dtype='<f8', count=n, offset=offset)[:] = batch.times
+    np.frombuffer(buf, dtype='<u4', count=n, offset=offset + 8 * n)[:] = batch.channels
+    return buf
+
+
+def decode_spikes(buf, n):
+    """Unpacks the body of a spike batch frame with `n` spikes into a `SpikeBatch`.
+
+    Times and channels are read-only views into `buf`.
+
+    """
+    t_start, t_stop = SPIKE_HEADER.unpack_from(buf, HEADER.size)
+    offset = HEADER.size + SPIKE_HEADER.size
+    times = np.frombuffer(buf, dtype='<f8', count=n, offset=offset)
+    channels = np.frombuffer(buf, dtype='<u4', count=n, offset=offset + 8 * n)
+    return SpikeBatch(t_start, t_stop, times, channels)
+
+
+def encode_binary(msg, message_type=OBSERVATION, out=None):
+    """Packs a message into a binary frame.
+
+    If `out` (a writable buffer of at least `frame_size(len(msg))` bytes)
+    is given, the frame is written into it to avoid allocations in tight
+    loops. Returns the frame as a memoryview.
+
+    """
+    n = len(msg)
+    if out is None:
+        out = bytearray(frame_size(n))
+    buf = memoryview(out)[:frame_size(n)]
+    HEADER.pack_into(buf, 0, MAGIC, VERSION, message_type, n)
+    np.frombuffer(buf, dtype=CHANNEL_DTYPE, count=n, offset=HEADER.size)[:] = msg
+    return buf
+
+
+def decode_binary(buf):
+    """Unpacks a binary frame into `(message_type, msg)`.
+
+    `msg` is a read-only view into `buf`; no data is copied. Frames of
+    type ``SPIKES`` are unpacked into a `SpikeBatch`.
+
+    """
+    magic, version, message_type, n = HEADER.unpack_from(buf)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError('not a binary frame (magic {!r}, version {})'.format(magic, version))
+    if message_type == SPIKES:
+        return message_type, decode_spikes(buf, n)
+    msg = np.frombuffer(buf, dtype=CHANNEL_DTYPE, count=n, offset=HEADER.size)
+    return message_type, msg
+
+
+def encode_json(msg):
+    """Converts a message to the list-of-dicts JSON format.
+
+    """
+    return [{'min': float(c['min']), 'max': float(c['max']), 'value': float(c['value']), 'ts': float(c['ts'])} for c in msg]
+
+
+def decode_json(obj):
+    """Converts a decoded JSON message (list of dicts) to a structured array.
+
+    Missing limits or timestamps are filled with NaN.
+
+    """
+    msg = np.empty(len(obj), dtype=CHANNEL_DTYPE)
+    for i, c in enumerate(obj):
+        msg[i] = (c.get('min', np.nan), c.get('max', np.nan), c['value'], c.get('ts', np.nan))
+    return msg
+
+
+def is_binary(buf):
+    """Checks whether `buf` starts with the binary frame magic.
+
+    """
+    return bytes(buf[:len(MAGIC)]) == MAGIC
+
+
+def decode(buf):
+    """Decodes a raw message in either format into a structured array.
+
+    """
+    if is_binary(buf):
+        return decode_binary(buf)[1]
+    return decode_json(json.loads(bytes(buf).decode('utf8')))
+
+
+def send(sock, msg, fmt='json', message_type=OBSERVATION, flags=0, topic=None):
+    """Sends a message via `sock` in the given wire format.
+
+    A `SpikeBatch` is always sent in the binary format. With a `topic`
+    (bytes or str), the message is preceded by a frame holding the
+    topic (see `nestrl.topics`).
+
+    """
+    if fmt not in FORMATS:
+        raise ValueError('unknown wire format {!r}, expected one of {}'.format(fmt, FORMATS))
+    if topic is not None:
+        sock.send(topic.encode() if isinstance(topic, str) else topic, flags=flags | zmq.SNDMORE)
+    if isinstance(msg, SpikeBatch):
+        sock.send(encode_spikes(msg), flags=flags, copy=False)
+    elif fmt == 'json':
+        sock.send_json(encode_json(msg), flags=flags)
+    else:
+        sock.send(encode_binary(msg, message_type), flags=flags, copy=False)
+
+
+def recv(sock, flags=0):
+    """Receives a message from `sock` in either wire format.
+
+    A topic frame preceding the message is skipped. Raises
+    ``zmq.error.Again`` like ``recv_json`` if a timeout is set.
+
+    """
+    return recv_topic(sock, flags)[1]
+
+
+def recv_topic(sock, flags=0):
+    """Receives a message from `sock` and returns `(topic, msg)`.
+
+    `topic` is ``b''`` for messages sent without a topic frame.
+
+    """
+    frame = sock.recv(flags=flags, copy=False)
+    if not frame.more:
+        return b'', decode(frame.buffer)
+    topic = frame.bytes
+    frame = sock.recv(copy=False)
+    return topic, decode(frame.buffer)
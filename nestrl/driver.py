@@ -0,0 +1,193 @@
+"""Coupling NEST networks to ZMQ directly, without MUSIC.
+
+Closing the loop with MUSIC needs mpirun, the music-adapters binaries
+and one MPI process per adapter. `Driver` replaces all of them within
+the NEST process: every ``music_timestep`` it normalizes the latest
+observation (`pipeline.ZmqCont`), injects it into the network, advances
+NEST with ``nest.Run`` and decodes the spikes of the output populations
+into a command. Inputs are injected by one of
+
+- `PoissonInput`: sets the rates of ``poisson_generator``s,
+- `SpikeInput`: regular spike trains of the ``rate_encoder`` fed to
+  ``spike_generator``s,
+- `CurrentInput`: the mean current of the equivalent Poisson input
+  (Campbell's theorem) via ``step_current_generator``s,
+
+each mapping values in [0, 1] to rates between `rate_min` and
+`rate_max` like the ``rate_encoder``. Values take effect after one
+resolution step, like spikes arriving via MUSIC.
+
+``nest.Prepare()`` needs to be called before the first step and
+``nest.Cleanup()`` after the last.
+
+"""
+
+import numpy as np
+import zmq
+
+from . import codec
+from . import pipeline
+from . import spikes
+from .profiler import Profiler
+
+
+class PoissonInput(object):
+    """Sets the rates of Poisson generators, one per channel.
+
+    """
+
+    def __init__(self, generators, rate_min=0., rate_max=100.):
+        self.generators = generators
+        self.rate_min = float(rate_min)
+        self.rate_max = float(rate_max)
+        self.rates = np.full(len(generators), np.nan)
+
+    def reset(self):
+        self.rates[:] = np.nan
+
+    def __call__(self, x, t):
+        import nest
+
+        rates = self.rate_min + np.clip(x, 0., 1.) * (self.rate_max - self.rate_min)
+        changed = np.flatnonzero(rates != self.rates)
+        if len(changed) > 0:
+            nest.SetStatus([self.generators[i] for i in changed], [{'rate': float(rates[i])} for i in changed])
+            self.rates[changed] = rates[changed]
+
+
+class SpikeInput(object):
+    """Feeds the regular spike trains of a `pipeline.RateEncoder` to spike generators.
+
+    """
+
+    def __init__(self, generators, encoder):
+        self.generators = generators
+        self.encoder = encoder
+
+    def reset(self):
+        self.encoder.reset()
+
+    def __call__(self, x, t):
+        import nest
+
+        counts = self.encoder(x)
+        channels = np.flatnonzero(counts)
+        if len(channels) > 0:
+            t_spike = t + self.encoder.dt * 1e3
+            nest.SetStatus([self.generators[i] for i in channels], [{'spike_times': [t_spike] * int(counts[i])} for i in channels])
+
+
+class CurrentInput(object):
+    """Injects the mean current of the equivalent Poisson input via step current generators.
+
+    With the input weight as connection weight, a rate `r` (in 1/s)
+    results in the current ``r * tau_syn * 1e-3`` times the weight,
+    the mean of the exponential synaptic currents of a Poisson input
+    with rate `r` (`tau_syn` in ms).
+
+    """
+
+    def __init__(self, generators, rate_min=0., rate_max=100., tau_syn=20., resolution=1.):
+        self.generators = generators
+        self.rate_min = float(rate_min)
+        self.rate_max = float(rate_max)
+        self.tau_syn = float(tau_syn)
+        self.resolution = float(resolution)
+        self.amplitudes = np.full(len(generators), np.nan)
+
+    def reset(self):
+        self.amplitudes[:] = np.nan
+
+    def __call__(self, x, t):
+        import nest
+
+        rates = self.rate_min + np.clip(x, 0., 1.) * (self.rate_max - self.rate_min)
+        amplitudes = rates * self.tau_syn * 1e-3
+        changed = np.flatnonzero(amplitudes != self.amplitudes)
+        if len(changed) > 0:
+            t_change = t + self.resolution
+            nest.SetStatus([self.generators[i] for i in changed], [{'amplitude_times': [t_change], 'amplitude_values': [float(amplitudes[i])]} for i in changed])
+            self.amplitudes[changed] = amplitudes[changed]
+
+
+class SpikeCounter(object):
+    """Counts the spikes recorded by `detector` per population since the last call.
+
+    """
+
+    def __init__(self, detector, populations):
+        self.detector = detector
+        self.channel = spikes.channel_lookup(populations)
+        self.n_channels = len(populations)
+
+    def __call__(self):
+        import nest
+
+        senders = nest.GetStatus(self.detector, 'events')[0]['senders']
+        nest.SetStatus(self.detector, {'n_events': 0})
+        return np.bincount(self.channel[senders], minlength=self.n_channels)
+
+
+def latest(sock):
+    """Returns the newest message pending on `sock` without blocking, or `None`.
+
+    """
+    msg = None
+    while True:
+        try:
+            msg = codec.recv(sock, zmq.NOBLOCK)
+        except zmq.error.Again:
+            return msg
+
+
+class Driver(object):
+    """Advances a NEST network by one ``music_timestep`` (in s) per step.
+
+    `inputs` is one of the input classes above, `counter` a
+    `SpikeCounter` of the output populations and `decoder` converts
+    spike counts per channel to a command, e.g. a `pipeline.Pipeline`
+    of `LinearDecoder`, `ThresholdAdapter` and `ContZmq`. With a
+    `nestrl.profiler.Profiler`, the time spent injecting the input,
+    in ``nest.Run`` and decoding is recorded per step.
+
+    """
+
+    def __init__(self, inputs, counter, decoder, music_timestep, profiler=None):
+        self.zmq_cont = pipeline.ZmqCont(music_timestep)
+        self.inputs = inputs
+        self.counter = counter
+        self.decoder = decoder
+        self.dt = music_timestep * 1e3  # ms
+        self.n_channels = len(inputs.generators)
+        self.t = 0.  # ms
+        self.profiler = profiler if profiler is not None else Profiler(enabled=False)
+
+    def reset(self):
+        """Forgets the last observation and continues at the current time of the kernel.
+
+        """
+        import nest
+
+        self.zmq_cont.reset()
+        self.inputs.reset()
+        self.decoder.reset()
+        self.t = nest.GetKernelStatus('time')
+
+    def step(self, obs=None):
+        """Advances by one timestep with the latest observation and returns the command.
+
+        `obs` is `None` if no new observation arrived; until the first
+        one arrives, no input is injected.
+
+        """
+        import nest
+
+        with self.profiler.span('inputs'):
+            x = self.zmq_cont(obs[:self.n_channels] if obs is not None else None)
+            if x is not None:
+                self.inputs(x, self.t)
+        with self.profiler.span('nest.Run'):
+            nest.Run(self.dt)
+        self.t += self.dt
+        with self.profiler.span('decode'):
+            return self.decoder(self.counter())
@@ -0,0 +1,103 @@
+"""Dropping outdated messages instead of working through a backlog.
+
+For control, only the freshest observation (or command) matters: after
+a slow tick, processing every queued message in order only delays the
+one that counts, so latency grows with the length of the queue.
+`Freshness` bounds it in three ways:
+
+- ``conflate``: sets ``ZMQ_CONFLATE`` on the socket, so ZMQ keeps only
+  the last message, and keeps only the last message per address of
+  every drained batch
+- ``hwm``: a low send/receive high-water mark, so ZMQ drops messages
+  once this many are queued
+- ``max_age``: drops messages whose newest ``ts`` is older than
+  ``max_age`` seconds on arrival; sender and receiver clocks need to be
+  synchronized when running on different hosts
+
+Messages dropped by ZMQ itself (conflation or high-water mark) cannot
+be counted; `n_conflated` and `n_dropped` count those discarded after
+receiving.
+
+A `codec.SpikeBatch` is never dropped after receiving: its times are
+biological, not wall-clock time, and every batch holds spikes of its
+own, so it is neither stale nor superseded by the next one.
+
+"""
+
+import collections
+import time
+
+import numpy as np
+import zmq
+
+from . import codec
+
+
+class Freshness(object):
+    """Freshness policy of a receiver.
+
+    """
+
+    def __init__(self, conflate=False, hwm=None, max_age=None, clock=time.time):
+        self.conflate = conflate
+        self.hwm = hwm
+        self.max_age = max_age
+        self.clock = clock
+        self.n_accepted = 0
+        self.n_dropped = 0
+        self.n_conflated = 0
+
+    def configure(self, sock, multipart=False):
+        """Sets the socket options of the policy; needs to be called before connecting or binding.
+
+        ``ZMQ_CONFLATE`` breaks multipart messages and would keep only
+        the last message of all topics, so it is not set if `multipart`
+        (e.g. topic frames, see `nestrl.topics`) messages are expected;
+        `filter` still conflates per stream.
+
+        """
+        if self.conflate and not multipart:
+            sock.setsockopt(zmq.CONFLATE, 1)
+        if self.hwm is not None:
+            sock.setsockopt(zmq.SNDHWM, self.hwm)
+            sock.setsockopt(zmq.RCVHWM, self.hwm)
+
+    def is_fresh(self, msg, now=None):
+        """Checks whether the newest channel of `msg` is at most `max_age` seconds old.
+
+        Messages without timestamps, such as spike batches, are
+        considered fresh.
+
+        """
+        if self.max_age is None or isinstance(msg, codec.SpikeBatch) or np.isnan(msg['ts']).all():
+            return True
+        now = self.clock() if now is None else now
+        return now - np.nanmax(msg['ts']) <= self.max_age
+
+    def filter(self, messages):
+        """Returns the messages of a batch of `(address, msg)` worth processing.
+
+        Stale messages are dropped; with `conflate`, only the last fresh
+        message per address is kept, except for spike batches, which are
+        all kept. The order of the kept messages is preserved.
+
+        """
+        now = self.clock()
+        fresh = [(addr, msg) for addr, msg in messages if self.is_fresh(msg, now)]
+        self.n_dropped += len(messages) - len(fresh)
+        if self.conflate:
+            last = collections.OrderedDict()
+            batches = []
+            for i, (addr, msg) in enumerate(fresh):
+                if isinstance(msg, codec.SpikeBatch):
+                    batches.append(i)
+                else:
+                    last[addr] = i
+            kept = sorted(list(last.values()) + batches)
+            self.n_conflated += len(fresh) - len(kept)
+            fresh = [fresh[i] for i in kept]
+        self.n_accepted += len(fresh)
+        return fresh
+
+    def summary(self):
+        return '{} accepted, {} dropped as stale, {} conflated'.format(self.n_accepted, self.n_dropped, self.n_conflated)
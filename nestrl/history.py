@@ -0,0 +1,159 @@
+"""Recording histories of received messages without allocating in the loop.
+
+Appending every received value to a Python list allocates on every
+tick, and printing every message blocks the loop on the terminal; on
+long runs both add jitter to the receive loop. `RingRecorder` instead
+writes each tick into a preallocated ring of rows (the time followed
+by one value per channel). The ring is divided into segments; once a
+segment is full, a background thread saves it to ``segment_<k>.npy``
+while the loop continues with the next one, so memory stays fixed
+independent of the length of a run. Segments left below the path by
+an earlier run are removed when a recorder starts. `load` maps all
+segments into memory with ``np.load(mmap_mode='r')``.
+
+`SummaryLogger` replaces per-message prints: the loop only hands it
+the latest message, and a background thread prints how many messages
+arrived and the latest one at most once per `interval`.
+
+"""
+
+import glob
+import os
+import queue
+import sys
+import threading
+import time
+
+import numpy as np
+
+
+class RingRecorder(object):
+    """Records the time and `n_channels` values per tick to ``.npy`` segments below `path`.
+
+    The ring holds `n_segments` segments of `segment` rows each. If the
+    background thread falls behind by more than ``n_segments - 1``
+    segments, the oldest unsaved one is overwritten and counted in
+    `n_overruns`. Segments of an earlier run below `path` are removed.
+
+    """
+
+    def __init__(self, path, n_channels, segment=1000, n_segments=4):
+        if n_segments < 2:
+            raise ValueError('need at least 2 segments, got {}'.format(n_segments))
+        self.path = path
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        for fname in glob.glob(os.path.join(path, 'segment_*.npy')):
+            os.remove(fname)
+        self.n_channels = n_channels
+        self.segment = segment
+        self.rows = np.zeros((n_segments * segment, 1 + n_channels))
+        self.n_segments = n_segments
+        self.n = 0  # rows recorded so far
+        self.n_overruns = 0
+
+        self._saved = [True] * n_segments
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._flush, daemon=True)
+        self._thread.start()
+
+    def record(self, t, values):
+        """Records `values` (one per channel) at time `t`.
+
+        """
+        i = self.n % len(self.rows)
+        if i % self.segment == 0 and not self._saved[i // self.segment]:
+            self.n_overruns += 1
+        row = self.rows[i]
+        row[0] = t
+        row[1:] = values
+        self.n += 1
+        if self.n % self.segment == 0:
+            self._submit(self.n - self.segment, self.n)
+
+    def close(self):
+        """Saves the last, partially filled segment and waits for all segments to be saved.
+
+        """
+        if self.n % self.segment != 0:
+            self._submit(self.n - self.n % self.segment, self.n)
+        self._queue.put(None)
+        self._thread.join()
+
+    def load(self):
+        return load(self.path)
+
+    def _submit(self, start, stop):
+        k = (start % len(self.rows)) // self.segment
+        self._saved[k] = False
+        self._queue.put((start // self.segment, k, stop - start))
+
+    def _flush(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            index, k, n = item
+            start = k * self.segment
+            np.save(os.path.join(self.path, 'segment_{:06d}.npy'.format(index)), self.rows[start:start + n])
+            self._saved[k] = True
+
+
+def load(path):
+    """Maps all segments saved below `path` into memory.
+
+    Returns the times and an array of values with one column per
+    channel. A single segment is returned as memory map, several are
+    concatenated.
+
+    """
+    segments = [np.load(fname, mmap_mode='r') for fname in sorted(glob.glob(os.path.join(path, 'segment_*.npy')))]
+    if not segments:
+        return np.empty(0), np.empty((0, 0))
+    rows = segments[0] if len(segments) == 1 else np.concatenate(segments)
+    return rows[:, 0], rows[:, 1:]
+
+
+class SummaryLogger(object):
+    """Prints a summary of the messages passed to `log` at most once per `interval` seconds.
+
+    Printing happens in a background thread, so `log` neither formats
+    nor blocks on `stream`.
+
+    """
+
+    def __init__(self, prefix='recv', interval=1., stream=sys.stdout):
+        self.prefix = prefix
+        self.interval = interval
+        self.stream = stream
+        self.n = 0  # messages logged so far
+        self.last = None
+
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._print, daemon=True)
+        self._thread.start()
+
+    def log(self, msg):
+        self.last = msg
+        self.n += 1
+
+    def close(self):
+        """Prints the summary of the remaining messages and stops the thread.
+
+        """
+        self._stop.set()
+        self._thread.join()
+
+    def _print(self):
+        n_printed = 0
+        t_last = time.monotonic()
+        while True:
+            stopped = self._stop.wait(self.interval)
+            n, last = self.n, self.last
+            if n > n_printed:
+                t = time.monotonic()
+                self.stream.write('{} {} messages ({:.0f}/s), last {}\n'.format(self.prefix, n - n_printed, (n - n_printed) / (t - t_last), last))
+                self.stream.flush()
+                n_printed, t_last = n, t
+            if stopped:
+                return
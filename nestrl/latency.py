@@ -0,0 +1,173 @@
+"""Latency and inter-arrival jitter of messages along the toolchain.
+
+Every GymObservation/GymCommand carries the time it was sent in its
+``ts`` field. A `HopMonitor` compares this timestamp with the arrival
+time to obtain the send-to-receive latency of one hop and additionally
+records the intervals between subsequent arrivals. Samples are counted
+in preallocated, logarithmically binned histograms, so recording does
+not allocate and memory does not grow with the length of a run.
+
+Only hops that end in a ZeroMQ socket can be observed from Python: the
+MUSIC adapters restamp ``ts`` when they send, so the latency measured
+on the output of ``cont_zmq_adapter`` covers the last hop only, while
+the hops inside MUSIC (``zmq_cont`` -> NEST -> ``cont_zmq``) advance in
+lockstep with ``music_timestep``. To monitor several hops at once,
+subscribe to each publishing port, e.g. for example 4::
+
+    $ python -m nestrl.latency sender=tcp://localhost:5556 cont_zmq=tcp://localhost:5555 --out latency.json
+
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import time
+
+import numpy as np
+
+PERCENTILES = (50., 99.)
+
+
+class Histogram(object):
+    """Counts durations (in seconds) in log-spaced bins between `t_min` and `t_max`.
+
+    Values below `t_min` (including negative values caused by clock
+    differences) and above `t_max` are counted in under- and overflow
+    bins; the exact maximum is tracked separately.
+
+    """
+
+    def __init__(self, t_min=1e-6, t_max=10., n_bins=600):
+        self.edges = np.logspace(np.log10(t_min), np.log10(t_max), n_bins + 1)
+        self.counts = np.zeros(n_bins + 2, dtype=np.int64)  # underflow, bins, overflow
+        self.n = 0
+        self.max = -np.inf
+
+    def add(self, value):
+        self.counts[np.searchsorted(self.edges, value, side='right')] += 1
+        self.n += 1
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        """Returns the upper edge of the bin containing the `q`-th percentile.
+
+        """
+        if self.n == 0:
+            return np.nan
+        idx = np.searchsorted(np.cumsum(self.counts), q / 100. * self.n, side='left')
+        if idx == 0:
+            return self.edges[0]
+        if idx > len(self.edges) - 1:
+            return self.max
+        return min(self.edges[idx], self.max)
+
+    def summary(self):
+        """Returns count, percentiles and maximum as a dictionary.
+
+        """
+        summary = collections.OrderedDict([('n', self.n)])
+        for q in PERCENTILES:
+            summary['p{:g}'.format(q)] = self.percentile(q)
+        summary['max'] = self.max if self.n > 0 else np.nan
+        return summary
+
+
+class HopMonitor(object):
+    """Records latency and inter-arrival intervals of messages arriving over one hop.
+
+    """
+
+    def __init__(self, name, **kwargs):
+        self.name = name
+        self.latency = Histogram(**kwargs)
+        self.interval = Histogram(**kwargs)
+        self._last_arrival = None
+
+    def record(self, msg, now=None):
+        """Records a message (structured array as returned by `codec.decode`).
+
+        The channel with the most recent timestamp determines the latency.
+
+        """
+        now = time.time() if now is None else now
+        self.latency.add(now - msg['ts'].max())
+        if self._last_arrival is not None:
+            self.interval.add(now - self._last_arrival)
+        self._last_arrival = now
+
+    def summary(self):
+        summary = collections.OrderedDict()
+        summary['latency'] = self.latency.summary()
+        summary['interval'] = self.interval.summary()
+        # spread of inter-arrival intervals around their median
+        summary['jitter'] = summary['interval']['p99'] - summary['interval']['p50']
+        return summary
+
+    def report(self):
+        """Returns a one-line summary in milliseconds.
+
+        """
+        s = self.summary()
+        return '{}: {} msgs, latency p50 {:.3f} ms, p99 {:.3f} ms, max {:.3f} ms; interval p50 {:.3f} ms, jitter {:.3f} ms'.format(
+            self.name, s['latency']['n'],
+            s['latency']['p50'] * 1e3, s['latency']['p99'] * 1e3, s['latency']['max'] * 1e3,
+            s['interval']['p50'] * 1e3, s['jitter'] * 1e3)
+
+
+class LatencyRecorder(object):
+    """Collection of `HopMonitor`s, one per named hop.
+
+    """
+
+    def __init__(self, hops, **kwargs):
+        self.hops = collections.OrderedDict((name, HopMonitor(name, **kwargs)) for name in hops)
+
+    def record(self, hop, msg, now=None):
+        self.hops[hop].record(msg, now)
+
+    def report(self):
+        return '\n'.join(hop.report() for hop in self.hops.values())
+
+    def write(self, fname):
+        """Writes the percentiles of all hops (in seconds) to a JSON file.
+
+        """
+        summary = collections.OrderedDict((name, hop.summary()) for name, hop in self.hops.items())
+        with open(fname, 'w') as f:
+            json.dump(summary, f, indent=4)
+
+
+def main():
+    from .aio import AsyncReceiver
+
+    parser = argparse.ArgumentParser(description='Record latency and jitter of ZeroMQ hops.')
+    parser.add_argument('hops', nargs='+', metavar='NAME=ADDR', help='hop name and address to subscribe to')
+    parser.add_argument('--t-max', type=float, default=10., help='recording duration in seconds')
+    parser.add_argument('--out', default=None, help='JSON file to write percentiles to')
+    args = parser.parse_args()
+
+    hops = collections.OrderedDict(hop.split('=', 1) for hop in args.hops)
+    recorder = LatencyRecorder(hops.keys())
+    receiver = AsyncReceiver(list(hops.values()))
+    names = {addr: name for name, addr in hops.items()}
+
+    async def receive():
+        async for addr, msg in receiver:
+            recorder.record(names[addr], msg)
+
+    loop = asyncio.get_event_loop()
+    try:
+        loop.run_until_complete(asyncio.wait_for(receive(), args.t_max))
+    except asyncio.TimeoutError:
+        pass
+    receiver.close()
+
+    print(recorder.report())
+    if args.out is not None:
+        recorder.write(args.out)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,148 @@
+"""Closed loop in lockstep, as fast as the CPU allows.
+
+With MUSIC running at ``rtf=1.`` and the ZMQ scripts paced by the wall
+clock, an episode costs as much wall-clock time as it covers
+biological time. In lockstep mode the environment and the controller
+instead take turns via a ZMQ REQ/REP pair: the environment sends an
+observation and blocks until the controller has encoded it, advanced
+the network by one environment step and replied with the decoded
+command. Nothing sleeps and no message can be dropped or arrive late,
+so an episode only takes as long as its computation, and runs with the
+same seeds are reproducible.
+
+The environment uses `Client`, the controller `serve`; an empty
+request ends an episode. `Controller` advances a NEST network without
+MUSIC, with the stages of `nestrl.pipeline` in place of the adapters.
+Together with a `nestrl.worker.Worker`, one controller serves many
+episodes in a row.
+
+"""
+
+import numpy as np
+import zmq
+
+from . import codec
+from . import spikes
+
+
+class Client(object):
+    """Environment side of the lockstep loop.
+
+    """
+
+    def __init__(self, addr, fmt='json', ctx=None):
+        self.fmt = fmt
+        self.ctx = ctx if ctx is not None else zmq.Context.instance()
+        self.sock = self.ctx.socket(zmq.REQ)
+        self.sock.connect(addr)
+
+    def step(self, obs):
+        """Sends an observation and returns the command computed from it.
+
+        """
+        codec.send(self.sock, obs, self.fmt)
+        return codec.recv(self.sock)
+
+    def close(self):
+        """Ends the episode of the controller and closes the socket.
+
+        """
+        self.sock.send(b'')
+        self.sock.recv()
+        self.sock.close()
+
+
+def serve(addr, step, fmt='json', ctx=None, n_episodes=1, end=None):
+    """Replies to every observation received on `addr` with the command `step(obs)`.
+
+    An empty request ends an episode; the socket stays bound for
+    `n_episodes` episodes, and after each `end(n_steps)` is called, if
+    given, e.g. to reset the controller. Returns the number of steps
+    served in all episodes.
+
+    """
+    ctx = ctx if ctx is not None else zmq.Context.instance()
+    sock = ctx.socket(zmq.REP)
+    sock.bind(addr)
+    n_total = 0
+    try:
+        for _ in range(n_episodes):
+            n_steps = 0
+            while True:
+                frame = sock.recv(copy=False)
+                if len(frame.buffer) == 0:
+                    sock.send(b'')
+                    break
+                codec.send(sock, step(codec.decode(frame.buffer)), fmt, codec.COMMAND)
+                n_steps += 1
+            n_total += n_steps
+            if end is not None:
+                end(n_steps)
+        return n_total
+    finally:
+        sock.close()
+
+
+class Controller(object):
+    """Advances a NEST network by one environment step per observation.
+
+    `generators` are spike generators driving the network, one per
+    channel, and `detector` is a spike detector connected to the output
+    populations, given per channel in `outputs` (one tuple of node ids
+    each). `encoder` converts an observation (or `None`, meaning no new
+    observation) to spike counts per channel and ``music_timestep``,
+    e.g. a `Pipeline` of `ZmqCont` and `RateEncoder`; `decoder` converts
+    spike counts per channel and ``music_timestep`` to a command, e.g. a
+    `Pipeline` of `LinearDecoder`, `ThresholdAdapter` and `ContZmq`.
+    Every call advances the network by `step` seconds and returns the
+    command after the last ``music_timestep``.
+
+    `music_timestep` needs to be a multiple of the NEST resolution;
+    ``nest.Prepare()`` needs to be called before the first step and
+    ``nest.Cleanup()`` after the last.
+
+    """
+
+    def __init__(self, generators, detector, outputs, encoder, decoder, music_timestep, step):
+        self.generators = generators
+        self.detector = detector
+        self.encoder = encoder
+        self.decoder = decoder
+        self.dt = music_timestep * 1e3  # ms
+        self.n_ticks = int(round(step / music_timestep))
+        self.t = 0.  # ms, biological time simulated so far
+
+        self.channel = spikes.channel_lookup(outputs)
+        self.counts = np.zeros((self.n_ticks, len(outputs)), dtype=np.int64)
+
+    def reset(self):
+        """Resets the encoder and decoder and continues at the current time of the kernel.
+
+        """
+        import nest
+
+        self.encoder.reset()
+        self.decoder.reset()
+        self.t = nest.GetKernelStatus('time')
+
+    def __call__(self, obs):
+        import nest
+
+        # spikes emitted by the encoder within tick k are sent at its end
+        obs = obs[:len(self.generators)]
+        counts = np.array([self.encoder(obs if k == 0 else None) for k in range(self.n_ticks)])
+        times = self.t + self.dt * np.arange(1, self.n_ticks + 1)
+        nest.SetStatus(self.generators, [{'spike_times': np.repeat(times, counts[:, i])} for i in range(len(self.generators))])
+
+        nest.Run(self.n_ticks * self.dt)
+
+        events = nest.GetStatus(self.detector, 'events')[0]
+        nest.SetStatus(self.detector, {'n_events': 0})
+        ticks = np.clip(np.ceil((events['times'] - self.t) / self.dt).astype(np.int64) - 1, 0, self.n_ticks - 1)
+        self.counts[:] = 0
+        np.add.at(self.counts, (ticks, self.channel[events['senders']]), 1)
+        self.t += self.n_ticks * self.dt
+
+        for k in range(self.n_ticks):
+            cmd = self.decoder(self.counts[k])
+        return cmd
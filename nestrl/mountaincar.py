@@ -0,0 +1,217 @@
+"""Vectorized MountainCar environment as a local stand-in for gymz.
+
+`MountainCar` implements the dynamics of ``MountainCar-v0`` with NumPy
+for a batch of cars, so many episodes advance with a single call
+and no gym dependency is needed. The server speaks the protocol of
+``gymz-controller``: it publishes GymObservations on port 5556 and
+reads GymCommands from port 5555, and reads the ``Env`` section of
+the gymz config::
+
+    $ python -m nestrl.mountaincar gym_config.json --cars 8
+
+With K cars, an observation has 2 K channels: the K positions followed
+by the K velocities, so a ``zmq_cont_adapter`` of width K (e.g. in
+``example4/config_batch.music``) passes the positions on. A command
+has one channel per car with values in {0, 1, 2} (accelerate left,
+do nothing, accelerate right).
+
+When a car reaches the goal or its episode times out, it shows
+``inter_trial_observation`` for ``inter_trial_duration`` seconds,
+ignoring commands, and then starts a new episode. With ``--lockstep``
+the server steps as fast as the controller replies (see
+`nestrl.lockstep`) instead of every ``update_interval`` seconds. With
+``--topics``, the observation of car ``i`` (its position and velocity)
+is published as a message of its own under the topic ``obs/<i>/`` (see
+`nestrl.topics`), so consumers can subscribe to single cars.
+
+"""
+
+import argparse
+import json
+
+import numpy as np
+import zmq
+
+from . import codec
+from . import driver
+from . import lockstep
+from . import topics
+from .freshness import Freshness
+from .ticker import Ticker
+
+MIN_POSITION = -1.2
+MAX_POSITION = 0.6
+MAX_SPEED = 0.07
+GOAL_POSITION = 0.5
+FORCE = 0.001
+GRAVITY = 0.0025
+
+# parameters of the Env section of the gymz config used by the server
+DEFAULTS = {
+    'update_interval': 0.02,  # s
+    'inter_trial_duration': 0.4,  # s
+    'inter_trial_observation': [-0.3, 0.],
+    'max_steps': 200,
+}
+
+
+class MountainCar(object):
+    """`n_cars` independent MountainCar-v0 environments.
+
+    Episodes end when a car reaches the goal or after `max_steps`
+    steps; the car then shows `inter_trial_observation` for
+    `inter_trial_steps` steps and starts a new episode from a random
+    position in [-0.6, -0.4].
+
+    """
+
+    def __init__(self, n_cars=1, max_steps=200, inter_trial_steps=0, inter_trial_observation=(-0.3, 0.), seed=None):
+        self.n_cars = n_cars
+        self.max_steps = max_steps
+        self.inter_trial_steps = inter_trial_steps
+        self.inter_trial_observation = np.asarray(inter_trial_observation, dtype=float)
+        self.rng = np.random.RandomState(seed)
+
+        self.position = np.zeros(n_cars)
+        self.velocity = np.zeros(n_cars)
+        self.steps = np.zeros(n_cars, dtype=np.int64)  # steps of the current episode
+        self.pause = np.zeros(n_cars, dtype=np.int64)  # remaining inter-trial steps
+        self.n_episodes = 0
+        self.n_successes = 0
+        self.episode_lengths = []
+        self.reset()
+
+    def reset(self, cars=None):
+        """Starts new episodes for `cars` (a boolean mask, default all).
+
+        """
+        cars = np.ones(self.n_cars, dtype=bool) if cars is None else cars
+        self.position[cars] = self.rng.uniform(-0.6, -0.4, np.count_nonzero(cars))
+        self.velocity[cars] = 0.
+        self.steps[cars] = 0
+        self.pause[cars] = 0
+
+    def step(self, actions):
+        """Advances all cars by one step with `actions` in {0, 1, 2}.
+
+        Returns a boolean mask of the cars whose episode ended.
+
+        """
+        running = self.pause == 0
+        actions = np.clip(np.rint(actions), 0, 2)
+
+        velocity = self.velocity + (actions - 1) * FORCE - np.cos(3 * self.position) * GRAVITY
+        velocity = np.clip(velocity, -MAX_SPEED, MAX_SPEED)
+        position = np.clip(self.position + velocity, MIN_POSITION, MAX_POSITION)
+        velocity[(position == MIN_POSITION) & (velocity < 0)] = 0.
+        self.position = np.where(running, position, self.position)
+        self.velocity = np.where(running, velocity, self.velocity)
+        self.steps += running
+
+        success = running & (self.position >= GOAL_POSITION) & (self.velocity >= 0.)
+        done = success | (running & (self.steps >= self.max_steps))
+        self.n_episodes += np.count_nonzero(done)
+        self.n_successes += np.count_nonzero(success)
+        self.episode_lengths.extend(self.steps[done].tolist())
+
+        # cars in the inter-trial phase start a new episode once it is over
+        self.pause[~running] -= 1
+        self.reset(~running & (self.pause == 0))
+        self.pause[done] = self.inter_trial_steps
+        self.reset(done & (self.pause == 0))
+        return done
+
+    def observation(self):
+        """Returns the GymObservation of all cars, positions followed by velocities.
+
+        """
+        position = np.where(self.pause > 0, self.inter_trial_observation[0], self.position)
+        velocity = np.where(self.pause > 0, self.inter_trial_observation[1], self.velocity)
+        low = np.repeat([MIN_POSITION, -MAX_SPEED], self.n_cars)
+        high = np.repeat([MAX_POSITION, MAX_SPEED], self.n_cars)
+        return codec.GymObservation(low, high, np.concatenate([position, velocity]))
+
+    def statistics(self):
+        """Returns the number of episodes and successes and the mean episode length.
+
+        """
+        return {
+            'episodes': int(self.n_episodes),
+            'successes': int(self.n_successes),
+            'mean_length': float(np.mean(self.episode_lengths)) if self.episode_lengths else None,
+        }
+
+    def summary(self):
+        mean_length = np.mean(self.episode_lengths) if self.episode_lengths else np.nan
+        return '{} episodes, {} reached the goal, mean length {:.1f} steps'.format(self.n_episodes, self.n_successes, mean_length)
+
+
+def read_config(fname):
+    """Returns the parameters of the ``Env`` section of a gymz config, with defaults.
+
+    """
+    with open(fname) as f:
+        env = json.load(f).get('Env', {})
+    if env.get('env', 'MountainCar-v0') != 'MountainCar-v0':
+        raise ValueError('only MountainCar-v0 is supported, got {!r}'.format(env['env']))
+    return {key: env.get(key, default) for key, default in DEFAULTS.items()}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Serve a batch of MountainCar environments like gymz-controller.')
+    parser.add_argument('config', help='gymz config file')
+    parser.add_argument('--cars', type=int, default=1, help='number of cars')
+    parser.add_argument('--t-max', type=float, default=10., help='duration in seconds of environment time')
+    parser.add_argument('--seed', type=int, default=None)
+    parser.add_argument('--lockstep', default=None, help='address of a lockstep controller, e.g. tcp://localhost:5557')
+    parser.add_argument('--episodes', type=int, default=1, help='episodes of --t-max seconds served to the lockstep controller, each ended by an empty request')
+    parser.add_argument('--obs-addr', default='tcp://*:5556', help='address to publish observations on')
+    parser.add_argument('--cmd-addr', default='tcp://localhost:5555', help='address to read commands from')
+    parser.add_argument('--topics', action='store_true', help='publish the observation of every car under its own topic')
+    parser.add_argument('--out', default=None, help='JSON file to write the episode statistics to')
+    args = parser.parse_args()
+
+    params = read_config(args.config)
+    dt = params['update_interval']
+    env = MountainCar(args.cars, params['max_steps'], int(round(params['inter_trial_duration'] / dt)), params['inter_trial_observation'], args.seed)
+    actions = np.ones(args.cars)
+
+    if args.lockstep is not None:
+        for _ in range(args.episodes):
+            client = lockstep.Client(args.lockstep)
+            for _ in range(int(round(args.t_max / dt))):
+                actions = client.step(env.observation())['value'][:args.cars]
+                env.step(actions)
+            client.close()
+            env.reset()
+    else:
+        ctx = zmq.Context()
+        pub = ctx.socket(zmq.PUB)
+        pub.bind(args.obs_addr)
+        sub = ctx.socket(zmq.SUB)
+        Freshness(conflate=True).configure(sub)
+        sub.connect(args.cmd_addr)
+        sub.setsockopt(zmq.SUBSCRIBE, b'')
+
+        ticker = Ticker(dt, args.t_max)
+        for _ in ticker:
+            command = driver.latest(sub)
+            if command is not None:
+                actions = command['value'][:args.cars]
+            env.step(actions)
+            obs = env.observation()
+            if args.topics:
+                for i in range(args.cars):
+                    codec.send(pub, obs[i::args.cars], topic=topics.topic(topics.OBSERVATION, i))
+            else:
+                codec.send(pub, obs)
+        print(ticker.summary())
+
+    print(env.summary())
+    if args.out is not None:
+        with open(args.out, 'w') as f:
+            json.dump(env.statistics(), f)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,281 @@
+"""Reading and checking MUSIC configuration files.
+
+`load` parses a config file into a `Config`, i.e., a graph of
+`Section`s connected by `Edge`s like ``zmq_cont.out->encoder.in[1]``,
+and checks it for consistency. Parameters that the NEST scripts need
+to agree on with MUSIC (simulation time, maximal input rate,
+resolution) are derived from it, so that a misconfigured toolchain
+fails at startup rather than after the full ``stoptime``::
+
+    $ python -m nestrl.music_config example4/config.music
+
+"""
+
+import collections
+import re
+import sys
+
+EDGE = re.compile(r'^(\w+)\.(\w+)->(\w+)\.(\w+)(?:\[(\d+)\])?$')
+
+# adapters that map every input channel to one output channel
+CHANNELWISE = ('rate_encoder', 'linear_decoder', 'threshold_adapter')
+
+# relative tolerance for comparing timesteps
+TOLERANCE = 1e-9
+
+
+class ConfigError(ValueError):
+    """Raised for inconsistent MUSIC configurations.
+
+    """
+    pass
+
+
+def read(fname):
+    """Reads a MUSIC config file.
+
+    Returns `(params, sections, edges)` with the global parameters as a
+    dictionary, the parameters of each application section as an
+    ordered dictionary of dictionaries, and the connections as a list
+    of strings like ``'zmq_cont.out->encoder.in[1]'``. All values are
+    kept as strings.
+
+    """
+    params = collections.OrderedDict()
+    sections = collections.OrderedDict()
+    edges = []
+
+    current = params
+    with open(fname) as f:
+        for line in f:
+            line = line.split('#', 1)[0].strip()
+            if not line:
+                continue
+            if line.startswith('[') and line.endswith(']'):
+                current = sections.setdefault(line[1:-1].strip(), collections.OrderedDict())
+            elif '->' in line:
+                edges.append(line.replace(' ', ''))
+            else:
+                key, _, value = line.partition('=')
+                current[key.strip()] = value.strip()
+
+    return params, sections, edges
+
+
+def write(fname, params, sections, edges):
+    """Writes a MUSIC config file in the format read by `read`.
+
+    """
+    with open(fname, 'w') as f:
+        for key, value in params.items():
+            f.write('{}={}\n'.format(key, value))
+        for name, section in sections.items():
+            f.write('[{}]\n'.format(name))
+            for key, value in section.items():
+                f.write('  {}={}\n'.format(key, value))
+        for edge in edges:
+            f.write(edge + '\n')
+
+
+Edge = collections.namedtuple('Edge', ['src', 'src_port', 'dst', 'dst_port', 'width'])
+
+
+class Section(object):
+    """An application (adapter or simulator) started by MUSIC.
+
+    `music_timestep` is given in seconds, or None if not set.
+
+    """
+
+    def __init__(self, name, params):
+        self.name = name
+        self.params = params
+        self.binary = params.get('binary')
+        self.np = int(params.get('np', 1))
+        self.music_timestep = float(params['music_timestep']) if 'music_timestep' in params else None
+
+    def get(self, key, default=None, type=str):
+        """Returns parameter `key` converted to `type`.
+
+        """
+        if key not in self.params:
+            return default
+        return type(self.params[key])
+
+    def __repr__(self):
+        return 'Section({!r}, binary={!r}, np={})'.format(self.name, self.binary, self.np)
+
+
+class Config(object):
+    """Graph of MUSIC sections and their connections.
+
+    """
+
+    def __init__(self, params, sections, edges):
+        self.params = params
+        self.stoptime = float(params.get('stoptime', 0.))  # s
+        self.rtf = float(params['rtf']) if 'rtf' in params else None
+        self.sections = collections.OrderedDict((name, Section(name, p)) for name, p in sections.items())
+        self.edges = []
+        for edge in edges:
+            match = EDGE.match(edge)
+            if match is None:
+                raise ConfigError('malformed connection {!r}'.format(edge))
+            src, src_port, dst, dst_port, width = match.groups()
+            self.edges.append(Edge(src, src_port, dst, dst_port, int(width) if width is not None else 1))
+
+    @property
+    def simtime(self):
+        """Simulation time in ms matching the stoptime.
+
+        """
+        return self.stoptime * 1e3
+
+    def inputs(self, name):
+        return [e for e in self.edges if e.dst == name]
+
+    def outputs(self, name):
+        return [e for e in self.edges if e.src == name]
+
+    def neighbours(self, name):
+        return [e.src for e in self.inputs(name)] + [e.dst for e in self.outputs(name)]
+
+    def width(self, name, port):
+        """Number of channels of port `port` of section `name`.
+
+        Input ports receive the sum of the widths of all incoming
+        connections, output ports send the width of their connections.
+
+        """
+        widths_in = [e.width for e in self.edges if e.dst == name and e.dst_port == port]
+        widths_out = [e.width for e in self.edges if e.src == name and e.src_port == port]
+        return sum(widths_in) + max(widths_out + [0])
+
+    def upstream(self, name, binary):
+        """Returns the section running `binary` that sends to `name`, or None.
+
+        """
+        for edge in self.inputs(name):
+            if self.sections[edge.src].binary == binary:
+                return self.sections[edge.src]
+        return None
+
+    def max_rate(self, name='nest'):
+        """Maximal rate (1/s) of the rate encoder projecting to section `name`.
+
+        """
+        encoder = self.upstream(name, 'rate_encoder')
+        if encoder is None:
+            return None
+        return encoder.get('rate_max', type=float)
+
+    def resolution(self, name='nest'):
+        """Smallest MUSIC timestep (in ms) of the sections connected to `name`.
+
+        """
+        timesteps = [self.sections[n].music_timestep for n in self.neighbours(name)]
+        timesteps = [dt for dt in timesteps if dt is not None]
+        return min(timesteps) * 1e3 if timesteps else None
+
+    def nest_parameters(self, name='nest'):
+        """Parameters of the NEST section `name` derived from the config.
+
+        Returns a dictionary with `simtime` (ms), `max_rate` (1/s, None
+        without encoder) and `resolution` (ms, None if no neighbour
+        sets a timestep).
+
+        """
+        if name not in self.sections:
+            raise ConfigError('no section {!r} in config'.format(name))
+        return {'simtime': self.simtime, 'max_rate': self.max_rate(name), 'resolution': self.resolution(name)}
+
+    def check(self, resolution=None, nest='nest'):
+        """Returns a list of all inconsistencies found.
+
+        If the NEST `resolution` (ms) is given, it is checked to divide
+        the timesteps of all sections connected to section `nest`.
+
+        """
+        errors = []
+        if self.stoptime <= 0.:
+            errors.append('stoptime needs to be positive')
+
+        for section in self.sections.values():
+            if not section.binary:
+                errors.append('section {!r} has no binary'.format(section.name))
+            if section.np < 1:
+                errors.append('section {!r} needs at least one process'.format(section.name))
+            dt = section.music_timestep
+            if dt is not None:
+                if dt <= 0.:
+                    errors.append('section {!r}: music_timestep needs to be positive'.format(section.name))
+                elif dt > self.stoptime:
+                    errors.append('section {!r}: music_timestep {} exceeds stoptime {}'.format(section.name, dt, self.stoptime))
+
+        for edge in self.edges:
+            for name in (edge.src, edge.dst):
+                if name not in self.sections:
+                    errors.append('connection {}.{}->{}.{} refers to unknown section {!r}'.format(edge.src, edge.src_port, edge.dst, edge.dst_port, name))
+            if edge.width < 1:
+                errors.append('connection {}->{} needs a positive width'.format(edge.src, edge.dst))
+        if errors:
+            return errors
+
+        for edge in self.edges:
+            dt_src = self.sections[edge.src].music_timestep
+            dt_dst = self.sections[edge.dst].music_timestep
+            if dt_src is not None and dt_dst is not None and not (_is_multiple(dt_src, dt_dst) or _is_multiple(dt_dst, dt_src)):
+                errors.append('timesteps of {!r} ({}) and {!r} ({}) are incompatible'.format(edge.src, dt_src, edge.dst, dt_dst))
+
+        for section in self.sections.values():
+            for port in set(e.src_port for e in self.outputs(section.name)):
+                widths = set(e.width for e in self.outputs(section.name) if e.src_port == port)
+                if len(widths) > 1:
+                    errors.append('port {}.{} is used with different widths {}'.format(section.name, port, sorted(widths)))
+            if section.binary in CHANNELWISE:
+                widths_in = sum(e.width for e in self.inputs(section.name))
+                widths_out = set(e.width for e in self.outputs(section.name))
+                if widths_out and widths_out != set([widths_in]):
+                    errors.append('{!r} ({}) receives {} channels but sends {}'.format(section.name, section.binary, widths_in, sorted(widths_out)))
+
+        if resolution is not None and nest in self.sections:
+            for name in self.neighbours(nest):
+                dt = self.sections[name].music_timestep
+                if dt is not None and not _is_multiple(dt * 1e3, resolution):
+                    errors.append('music_timestep of {!r} ({} ms) is not a multiple of the resolution ({} ms)'.format(name, dt * 1e3, resolution))
+
+        return errors
+
+    def validate(self, resolution=None, nest='nest'):
+        """Raises `ConfigError` listing all inconsistencies, if any.
+
+        """
+        errors = self.check(resolution, nest)
+        if errors:
+            raise ConfigError('inconsistent MUSIC config:\n  ' + '\n  '.join(errors))
+        return self
+
+
+def _is_multiple(a, b):
+    ratio = a / b
+    return abs(ratio - round(ratio)) < TOLERANCE * max(1., abs(ratio)) and round(ratio) >= 1
+
+
+def load(fname, resolution=None, nest='nest'):
+    """Reads and validates a MUSIC config file.
+
+    """
+    return Config(*read(fname)).validate(resolution, nest)
+
+
+if __name__ == '__main__':
+    for fname in sys.argv[1:]:
+        config = Config(*read(fname))
+        print('{}: stoptime {} s, {} sections, {} connections'.format(fname, config.stoptime, len(config.sections), len(config.edges)))
+        for edge in config.edges:
+            print('  {}.{} -> {}.{} [{}]'.format(*edge))
+        errors = config.check()
+        for error in errors:
+            print('  error:', error)
+        if errors:
+            sys.exit(1)
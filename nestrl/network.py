@@ -0,0 +1,86 @@
+"""Builder of the MountainCar controller of example 4.
+
+The controller consists of three roles per environment: a "left"
+population active while the car is in the left half, a "right"
+population active in the right half and a "command" population driven
+by left and inhibited by right, whose activity encodes "accelerate
+right". In example 4 every role is a single neuron; here every role
+can be a population of `size` neurons, which averages out the noise of
+single neurons. Populations are connected with ``fixed_indegree``
+connectivity and weights scaled by the indegree, so the mean input and
+hence the calibration of the resting potentials via
+`get_current_offset` do not depend on the population size.
+
+"""
+
+import collections
+
+import numpy as np
+
+
+def get_current_offset(weight, rate, tau_m, tau_syn, C_m):
+    """
+    Computes the mean input expected from an input with rate `rate`
+    and weight `weight` for a neuron with parameters `tau_m`,
+    `tau_syn` and `C_m` (see Campbell's theorem).
+
+    """
+    return weight / C_m * rate * tau_m * tau_syn * 1e-3
+
+
+Circuit = collections.namedtuple('Circuit', ['left', 'right', 'command'])
+
+
+def build_circuit(inputs, outputs=None, size=1, indegree=10, J=200., tau_m=1., tau_syn=20., max_rate=50.):
+    """Creates one controller per node in `inputs` and returns its populations.
+
+    `inputs` holds one spike source per environment (e.g. MUSIC input
+    proxies), each projecting to all neurons of the left and right
+    population of its environment. If `outputs` (a MUSIC output proxy)
+    is given, the command population of environment `i` sends to its
+    channel `i`. `max_rate` is the maximal rate of the inputs, which
+    are expected to fire at `max_rate / 2` in the middle of the track.
+
+    Returns a `Circuit` with the populations of all environments, each
+    a list with one tuple of node ids per environment.
+
+    """
+    import nest
+
+    n_envs = len(inputs)
+    indegree = min(indegree, size)
+    C_m = nest.GetDefaults('iaf_psc_exp', 'C_m')
+    params = {'V_th': -60., 'tau_m': tau_m, 'tau_syn_ex': tau_syn, 'tau_syn_in': tau_syn, 'C_m': C_m}
+
+    left = nest.Create('iaf_psc_exp', n_envs * size, dict(params, **{
+        'E_L': -60.3 + get_current_offset(J, max_rate / 2., tau_m, tau_syn, C_m),  # add additional 0.3mV to make the left neurons a bit less excitable
+    }))
+    right = nest.Create('iaf_psc_exp', n_envs * size, dict(params, **{
+        'E_L': -60. + get_current_offset(-J, max_rate / 2., tau_m, tau_syn, C_m),
+    }))
+    command = nest.Create('iaf_psc_exp', n_envs * size, dict(params, **{'E_L': -60., 'tau_m': 10 * tau_m}))
+
+    circuit = Circuit(*[[population[i * size:(i + 1) * size] for i in range(n_envs)] for population in (left, right, command)])
+
+    # every input drives the `size` left and right neurons of its
+    # environment; one one_to_one call each, with the inputs repeated
+    sources = [node for node in inputs for _ in range(size)]
+    nest.Connect(sources, left, 'one_to_one', syn_spec={'weight': -J})
+    nest.Connect(sources, right, 'one_to_one', syn_spec={'weight': J})
+
+    # excitation from left and inhibition from right cancel on average,
+    # independent of the indegree, since the total weight is J; the
+    # indegree applies within each environment, so these projections
+    # are the only ones connected per environment
+    conn_spec = {'rule': 'fixed_indegree', 'indegree': indegree}
+    for i in range(n_envs):
+        nest.Connect(circuit.left[i], circuit.command[i], conn_spec, {'weight': J / indegree})
+        nest.Connect(circuit.right[i], circuit.command[i], conn_spec, {'weight': -J / indegree})
+
+    if outputs is not None:
+        # the output channel is a property of the connection to the
+        # proxy, the command neurons of environment i send to channel i
+        channels = np.repeat(np.arange(n_envs), size)
+        nest.Connect(command, list(outputs) * len(command), 'one_to_one', syn_spec={'music_channel': channels})
+
+    return circuit
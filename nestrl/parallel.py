@@ -0,0 +1,136 @@
+"""Choosing the number of threads of the NEST section.
+
+The number of MPI ranks of the NEST section is fixed by ``np`` in the
+MUSIC config, but the number of threads per rank
+(``local_num_threads``) can be chosen at startup. `choose_threads`
+simulates a stand-in of the network (with the MUSIC proxies replaced
+by generators, since MUSIC ports can only be used once) for increasing
+thread counts and returns the smallest count that keeps the real-time
+factor below the target, so that the simulation keeps up with MUSIC
+running at ``rtf=1.``.
+
+The measurement needs a NEST process of its own: with MUSIC-enabled
+NEST, the first ``nest.Simulate`` of a process sets up MUSIC, after
+which no ports can be published, so it cannot run in the section that
+MUSIC launched. Run it as a separate step and pass the result to the
+NEST script with ``--threads``::
+
+    $ python -m nestrl.parallel example4/config.music
+    $ python -m nestrl.parallel example4/config.music --population-size 100 --param J=100.
+    $ mpirun -np 2 python -m nestrl.parallel example4/config_parallel.music
+
+Threads are chosen for the ``np`` ranks of the nest section, which
+share the cores of the host, so at most ``cpu_count // np`` threads
+per rank are tested. Started with as many MPI processes as ``np``, the
+stand-in is distributed over them like the network under MUSIC;
+started in a single process with ``np`` greater than one, the whole
+stand-in is simulated by one rank, which overestimates the time per
+rank.
+
+"""
+
+import argparse
+import multiprocessing
+import os
+import time
+
+
+def measure_rtf(build, n_threads, resolution, simtime=200., comm=None):
+    """Returns the real-time factor of the network created by `build()` with `n_threads` threads.
+
+    The real-time factor is the wall-clock time per biological time;
+    with several ranks (`comm`), the slowest rank determines it. `comm`
+    must contain exactly the NEST ranks, hence not ``MPI.COMM_WORLD``
+    when running under MUSIC.
+
+    """
+    import nest
+
+    nest.ResetKernel()
+    nest.set_verbosity('M_ERROR')
+    nest.SetKernelStatus({'resolution': resolution, 'local_num_threads': n_threads})
+    build()
+
+    nest.Simulate(10 * resolution)  # exclude one-time preparation from the measurement
+    t_start = time.perf_counter()
+    nest.Simulate(simtime)
+    rtf = (time.perf_counter() - t_start) * 1e3 / simtime
+
+    if comm is not None:
+        rtf = max(comm.allgather(rtf))
+    return rtf
+
+
+def choose_threads(build, resolution, target=1., max_threads=None, simtime=200., comm=None):
+    """Returns the smallest number of threads per rank with a real-time factor below `target`.
+
+    Candidates are powers of two up to `max_threads` (by default the
+    number of cores divided by the number of ranks). If none of them
+    is fast enough, the fastest one is returned. The second return
+    value maps the tested thread counts to their real-time factors.
+
+    """
+    n_ranks = comm.Get_size() if comm is not None else 1
+    if max_threads is None:
+        max_threads = max(1, multiprocessing.cpu_count() // n_ranks)
+
+    candidates = [1]
+    while candidates[-1] * 2 <= max_threads:
+        candidates.append(candidates[-1] * 2)
+    if candidates[-1] != max_threads:
+        candidates.append(max_threads)
+
+    rtfs = {}
+    for n_threads in candidates:
+        rtfs[n_threads] = measure_rtf(build, n_threads, resolution, simtime, comm)
+        if rtfs[n_threads] < target:
+            return n_threads, rtfs
+    return min(rtfs, key=rtfs.get), rtfs
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Print the number of threads per rank that keeps the example 4 network up with real time.')
+    parser.add_argument('config', help='MUSIC config of the toolchain')
+    parser.add_argument('--population-size', type=int, default=1, help='neurons per role (left, right, command) and environment')
+    parser.add_argument('--indegree', type=int, default=10, help='inputs a command neuron receives from each of the left and right populations')
+    parser.add_argument('--param', action='append', default=[], metavar='NAME=VALUE', help='network parameter as passed to the NEST script, e.g. J=100.')
+    parser.add_argument('--target', type=float, default=1., help='real-time factor to stay below')
+    parser.add_argument('--max-threads', type=int, default=None, help='largest thread count per rank to test, by default the number of cores divided by np of the nest section')
+    args = parser.parse_args()
+
+    from . import music_config, network
+
+    config = music_config.load(os.path.abspath(args.config))
+    n_ranks = config.sections['nest'].np
+    comm = None
+    import nest
+    if nest.NumProcesses() > 1:
+        # outside MUSIC, COMM_WORLD holds exactly the NEST ranks
+        from mpi4py import MPI
+        if nest.NumProcesses() != n_ranks:
+            parser.error('started with {} MPI processes, but the nest section has np={}'.format(nest.NumProcesses(), n_ranks))
+        comm = MPI.COMM_WORLD
+    max_threads = args.max_threads if args.max_threads is not None else max(1, multiprocessing.cpu_count() // n_ranks)
+    n_envs = config.width('nest', 'in')
+    resolution = config.resolution()
+    max_rate = config.max_rate()
+    params = {'tau_m': 1., 'tau_syn': 20., 'J': 200.}
+    for param in args.param:
+        name, _, value = param.partition('=')
+        params[name] = float(value)
+
+    def build_stand_in():
+        # the network with the MUSIC proxies replaced by generators
+        inputs = nest.Create('poisson_generator', n_envs, {'rate': max_rate / 2.})
+        network.build_circuit(inputs, None, args.population_size, args.indegree, params['J'],
+                              params['tau_m'], params['tau_syn'], max_rate)
+
+    n_threads, rtfs = choose_threads(build_stand_in, resolution, args.target, max_threads, comm=comm)
+    if comm is None or comm.Get_rank() == 0:
+        for n, rtf in sorted(rtfs.items()):
+            print('{:3d} threads per rank: real-time factor {:.3f}'.format(n, rtf))
+        print('np={} ranks{}: --threads {}'.format(n_ranks, '' if comm is not None or n_ranks == 1 else ' (measured on one rank)', n_threads))
+
+
+if __name__ == '__main__':
+    main()
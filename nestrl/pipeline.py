@@ -0,0 +1,354 @@
+"""In-process, vectorized versions of the MUSIC adapters.
+
+The MUSIC toolchain of example 4 runs every adapter in its own MPI
+process. The stages in this module implement the same transformations
+with NumPy on arrays with one entry per channel, so a whole chain runs
+in a single process and its per-tick cost can be measured:
+
+- `ZmqCont`: GymObservation -> continuous value in [0, 1] (``zmq_cont_adapter``)
+- `RateEncoder`: continuous value -> regular spike train (``rate_encoder``)
+- `LinearDecoder`: spikes -> exponentially filtered rate (``linear_decoder``)
+- `ThresholdAdapter`: continuous value -> thresholded value (``threshold_adapter``)
+- `ContZmq`: continuous value -> GymCommand (``cont_zmq_adapter``)
+- `ActionReadout`: spikes -> discrete action, replacing ``linear_decoder``
+  and ``threshold_adapter`` without the lag of their filter
+
+Each stage is a callable advancing by one ``music_timestep`` (in
+seconds) per call. Stages can be built from the ``[section]``
+parameters of a MUSIC config file with `from_section`, and are chained
+by `Pipeline`, which also accounts the time spent in every stage (and
+records it as spans of a `nestrl.profiler.Profiler`, if given). Any
+other callable, e.g. one advancing a network by one timestep, can be
+inserted between them.
+
+"""
+
+import collections
+import time
+
+import numpy as np
+
+from . import codec
+from . import music_config
+
+
+class Stage(object):
+    """Base class of all stages.
+
+    """
+
+    def __init__(self, music_timestep):
+        self.dt = float(music_timestep)
+
+    def __call__(self, x):
+        raise NotImplementedError()
+
+    def reset(self):
+        """Resets the dynamic state of the stage.
+
+        """
+        pass
+
+
+class ZmqCont(Stage):
+    """Converts GymObservations to values normalized by their limits.
+
+    Holds the last value of each channel until a new observation arrives.
+
+    """
+
+    def __init__(self, music_timestep):
+        super(ZmqCont, self).__init__(music_timestep)
+        self.value = None
+
+    def __call__(self, msg):
+        if msg is not None:
+            self.value = (msg['value'] - msg['min']) / (msg['max'] - msg['min'])
+        return self.value
+
+    def reset(self):
+        self.value = None
+
+
+class RateEncoder(Stage):
+    """Converts values in [0, 1] to spike counts of regular spike trains.
+
+    The rate is `rate_min + x * (rate_max - rate_min)` (in 1/s); every
+    channel integrates its rate into a phase and emits a spike whenever
+    the phase crosses an integer.
+
+    """
+
+    def __init__(self, music_timestep, rate_min=0., rate_max=100.):
+        super(RateEncoder, self).__init__(music_timestep)
+        self.rate_min = float(rate_min)
+        self.rate_max = float(rate_max)
+        self.phase = None
+
+    def __call__(self, x):
+        if self.phase is None or self.phase.shape != np.shape(x):
+            self.phase = np.zeros(np.shape(x))
+        self.phase += (self.rate_min + np.clip(x, 0., 1.) * (self.rate_max - self.rate_min)) * self.dt
+        counts = np.floor(self.phase)
+        self.phase -= counts
+        return counts.astype(np.int64)
+
+    def reset(self):
+        self.phase = None
+
+
+class LinearDecoder(Stage):
+    """Converts spike counts to rates (in 1/s) by filtering with an exponential kernel.
+
+    """
+
+    def __init__(self, music_timestep, tau=1.):
+        super(LinearDecoder, self).__init__(music_timestep)
+        self.tau = float(tau)
+        self.decay = np.exp(-self.dt / self.tau)
+        self.rate = None
+
+    def __call__(self, counts):
+        if self.rate is None or self.rate.shape != np.shape(counts):
+            self.rate = np.zeros(np.shape(counts))
+        self.rate *= self.decay
+        self.rate += np.asarray(counts) / self.tau
+        return self.rate
+
+    def reset(self):
+        self.rate = None
+
+
+class ThresholdAdapter(Stage):
+    """Thresholds continuous values.
+
+    With `is_heaviside` the output is `scale` above `threshold` and zero
+    otherwise; without, values above `threshold` are passed on (times
+    `scale`) and all others are set to zero.
+
+    """
+
+    def __init__(self, music_timestep, threshold=0., scale=1., is_heaviside=True):
+        super(ThresholdAdapter, self).__init__(music_timestep)
+        self.threshold = float(threshold)
+        self.scale = float(scale)
+        self.is_heaviside = is_heaviside
+
+    def __call__(self, x):
+        above = x > self.threshold
+        if self.is_heaviside:
+            return self.scale * above
+        return self.scale * np.where(above, x, 0.)
+
+
+class ActionReadout(Stage):
+    """Converts spike counts of command populations to discrete actions.
+
+    Counts are summed over the last `window` seconds (a multiple of
+    ``music_timestep``) and converted to rates (in 1/s), so an action
+    responds to spikes within one ``music_timestep``. Every environment
+    has `n_populations` consecutive channels. With one, the action is
+    `high` while the rate is above `threshold` and `low` otherwise, like
+    ``linear_decoder`` followed by ``threshold_adapter`` with ``scale``
+    `high`; with several, the action selects the population with the
+    highest rate (e.g. accelerate left, do nothing, accelerate right)
+    and is kept while none of them fires. Population `i` maps to
+    ``low + i * (high - low) / (n_populations - 1)``, i.e. the index
+    itself for ``low=0`` and ``high=n_populations - 1``, and the first
+    population is selected initially.
+
+    `hysteresis` (in 1/s) suppresses flickering between actions: with
+    one population, the rate needs to exceed `threshold` by
+    `hysteresis` to switch to `high` and fall below `threshold` by
+    `hysteresis` to switch back; with several, a population needs to
+    exceed the rate of the current action by more than `hysteresis`.
+
+    """
+
+    def __init__(self, music_timestep, window=0.02, threshold=1., hysteresis=0., n_populations=1, low=0., high=2.):
+        super(ActionReadout, self).__init__(music_timestep)
+        self.n_bins = max(1, int(round(window / self.dt)))
+        self.window = self.n_bins * self.dt
+        self.threshold = float(threshold)
+        self.hysteresis = float(hysteresis)
+        self.n_populations = int(n_populations)
+        self.low = float(low)
+        self.high = float(high)
+        self.bins = None
+        self.reset()
+
+    def __call__(self, counts):
+        if self.bins is None or self.bins.shape[1] != len(counts):
+            self._allocate(len(counts))
+        # the window is a ring of bins with a running sum
+        bin = self.bins[self.k]
+        self.counts -= bin
+        bin[:] = counts
+        self.counts += bin
+        self.k = (self.k + 1) % self.n_bins
+        np.multiply(self.counts, 1. / self.window, out=self.rate)
+
+        if self.n_populations == 1:
+            # switch on above threshold + hysteresis, stay on above threshold - hysteresis
+            np.greater(self.rate, self.threshold + self.hysteresis, out=self._above)
+            np.greater(self.rate, self.threshold - self.hysteresis, out=self._stay)
+            np.logical_and(self._on, self._stay, out=self._on)
+            np.logical_or(self._on, self._above, out=self._on)
+            np.multiply(self._on, self.high - self.low, out=self.action)
+            self.action += self.low
+        else:
+            rate = self.rate.reshape(-1, self.n_populations)
+            best = np.argmax(rate, axis=1)
+            current = rate[self._envs, self._current]
+            switch = rate[self._envs, best] > current + self.hysteresis
+            self._current[switch] = best[switch]
+            np.multiply(self._current, (self.high - self.low) / (self.n_populations - 1), out=self.action)
+            self.action += self.low
+        return self.action
+
+    def reset(self):
+        self.bins = None
+        self.k = 0
+
+    def _allocate(self, n_channels):
+        if n_channels % self.n_populations != 0:
+            raise ValueError('{} channels cannot be split into populations of {} per environment'.format(n_channels, self.n_populations))
+        n_envs = n_channels // self.n_populations
+        self.bins = np.zeros((self.n_bins, n_channels), dtype=np.int64)
+        self.counts = np.zeros(n_channels, dtype=np.int64)
+        self.rate = np.zeros(n_channels)
+        self.action = np.full(n_envs, self.low)
+        self._on = np.zeros(n_channels, dtype=bool)
+        self._above = np.zeros(n_channels, dtype=bool)
+        self._stay = np.zeros(n_channels, dtype=bool)
+        self._envs = np.arange(n_envs)
+        self._current = np.zeros(n_envs, dtype=np.int64)
+
+
+class ContZmq(Stage):
+    """Converts continuous values to GymCommands with limits `min` and `max`.
+
+    """
+
+    def __init__(self, music_timestep, min=0., max=1.):
+        super(ContZmq, self).__init__(music_timestep)
+        self.min = float(min)
+        self.max = float(max)
+
+    def __call__(self, x):
+        return codec.GymCommand(self.min, self.max, x)
+
+
+# MUSIC adapter binaries and the stages replacing them
+STAGES = {
+    'zmq_cont_adapter': ZmqCont,
+    'rate_encoder': RateEncoder,
+    'linear_decoder': LinearDecoder,
+    'threshold_adapter': ThresholdAdapter,
+    'cont_zmq_adapter': ContZmq,
+}
+
+# section parameters and how to convert them
+PARAMS = {
+    'music_timestep': float,
+    'rate_min': float,
+    'rate_max': float,
+    'tau': float,
+    'threshold': float,
+    'scale': float,
+    'window': float,
+    'hysteresis': float,
+    'n_populations': int,
+    'min': float,
+    'max': float,
+    'is_heaviside': lambda s: s.lower() == 'true',
+}
+
+
+def from_section(section):
+    """Creates the stage replacing the adapter described by a config section.
+
+    `section` is a dictionary of (string) parameters as returned by
+    `music_config.read`.
+
+    """
+    stage = STAGES[section['binary']]
+    kwargs = {key: PARAMS[key](value) for key, value in section.items() if key in PARAMS}
+    return stage(**kwargs)
+
+
+def readout_from_section(section):
+    """Creates the stages decoding commands within the NEST process from its config section.
+
+    The `ActionReadout` is configured by the parameters of the section
+    prefixed with ``readout_`` (e.g. ``readout_window``), the `ContZmq`
+    by ``min`` and ``max``; both advance by ``music_timestep``. Returns
+    the list of named stages for `Pipeline`.
+
+    """
+    kwargs = {key[len('readout_'):]: PARAMS[key[len('readout_'):]](value) for key, value in section.items()
+              if key.startswith('readout_') and key[len('readout_'):] in PARAMS}
+    music_timestep = float(section['music_timestep'])
+    return [
+        ('readout', ActionReadout(music_timestep, **kwargs)),
+        ('cont_zmq', ContZmq(music_timestep, float(section.get('min', 0.)), float(section.get('max', 2.)))),
+    ]
+
+
+def command_stages(sections, name='nest'):
+    """Returns the named stages converting the spike counts of section `name` to commands.
+
+    `sections` maps section names to their parameters. If section
+    `name` configures a readout, its stages are returned (see
+    `readout_from_section`), otherwise those replacing the ``decoder``,
+    ``threshold`` and ``cont_zmq`` sections.
+
+    """
+    if 'readout_window' in sections[name]:
+        return readout_from_section(sections[name])
+    return [(stage, from_section(sections[stage])) for stage in ['decoder', 'threshold', 'cont_zmq']]
+
+
+class Pipeline(object):
+    """Chains named stages and measures the time spent in each of them.
+
+    """
+
+    def __init__(self, stages, profiler=None):
+        self.stages = collections.OrderedDict(stages)
+        self.cost = np.zeros(len(self.stages))
+        self.n_ticks = 0
+        self.profiler = profiler
+        self.span_ids = [profiler.name_id(name) for name in self.stages] if profiler is not None else None
+
+    @classmethod
+    def from_config(cls, fname, names):
+        """Builds a pipeline from the sections `names` of a MUSIC config file.
+
+        """
+        _, sections, _ = music_config.read(fname)
+        return cls([(name, from_section(sections[name])) for name in names])
+
+    def __call__(self, x):
+        for i, stage in enumerate(self.stages.values()):
+            t_start = time.perf_counter()
+            x = stage(x)
+            cost = time.perf_counter() - t_start
+            self.cost[i] += cost
+            if self.profiler is not None:
+                self.profiler.add_id(self.span_ids[i], t_start, cost)
+        self.n_ticks += 1
+        return x
+
+    def reset(self):
+        for stage in self.stages.values():
+            stage.reset()
+
+    def report(self):
+        """Returns the mean time per tick spent in every stage.
+
+        """
+        n_ticks = max(self.n_ticks, 1)
+        lines = ['{:>12}: {:8.2f} us/tick'.format(name, cost / n_ticks * 1e6) for name, cost in zip(self.stages, self.cost)]
+        lines.append('{:>12}: {:8.2f} us/tick'.format('total', self.cost.sum() / n_ticks * 1e6))
+        return '\n'.join(lines)
@@ -0,0 +1,289 @@
+"""Per-stage time breakdown of the closed loop as Chrome trace.
+
+When the toolchain misses its ``rtf=1.`` deadline, the tick counters
+of `Ticker` tell that it was late, not which stage was slow. A
+`Profiler` records the start and duration of named spans, e.g. around
+``nest.Run``, the stages of a `pipeline.Pipeline` or the body of a
+sender loop, in preallocated arrays, and writes them as Chrome trace
+JSON, which ``chrome://tracing`` and https://ui.perfetto.dev show as a
+timeline per process and from which `summary` derives the time spent
+per stage.
+
+A `Tap` is a pass-through stage that records every message arriving at
+a boundary as a span from its ``ts`` (when it was sent) to its arrival,
+i.e. the time spent in the hop before it. Spans are stamped with the
+wall-clock time, so traces of several processes on one host line up;
+`merge` combines them into a single file. Boundaries outside Python
+processes (gymz, the MUSIC adapters) are observed by tapping the ports
+they publish on::
+
+    $ python -m nestrl.profiler tap gym=tcp://localhost:5556 cont_zmq=tcp://localhost:5555 --out trace_hops.json
+    $ python -m nestrl.profiler merge trace_*.json --out trace.json
+
+"""
+
+import argparse
+import asyncio
+import collections
+import json
+import os
+import time
+
+import numpy as np
+
+
+class Span(object):
+    """Context manager recording the time spent in its body as span `name`.
+
+    """
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = profiler.name_id(name)
+        self.start = None
+
+    def __enter__(self):
+        self.start = self.profiler.clock()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.add_id(self.name, self.start, self.profiler.clock() - self.start)
+
+
+class NullSpan(object):
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        pass
+
+
+class Profiler(object):
+    """Records up to `capacity` spans of the process `process`.
+
+    Spans beyond `capacity` are counted in `n_overflow` but not
+    recorded. A profiler with ``enabled=False`` records nothing and
+    allocates no buffers, so it can stay in place when not profiling.
+
+    """
+
+    def __init__(self, process='nestrl', capacity=100000, enabled=True, clock=time.perf_counter):
+        self.process = process
+        self.enabled = enabled
+        self.clock = clock
+        # wall-clock time at clock() == 0, in s
+        self.offset = time.time() - clock()
+        capacity = capacity if enabled else 0
+        self.starts = np.zeros(capacity)
+        self.durations = np.zeros(capacity)
+        self.ids = np.zeros(capacity, dtype=np.int32)
+        self.hops = set()  # ids of spans recorded by taps
+        self.names = []
+        self.n = 0
+        self.n_overflow = 0
+        self._ids = {}
+        self._spans = {}
+
+    def name_id(self, name):
+        if name not in self._ids:
+            self._ids[name] = len(self.names)
+            self.names.append(name)
+        return self._ids[name]
+
+    def add_id(self, name_id, start, duration):
+        """Records a span given the id of its name and its start and duration on `clock`, in s.
+
+        """
+        if self.n >= len(self.starts):
+            if self.enabled:
+                self.n_overflow += 1
+            return
+        self.starts[self.n] = start
+        self.durations[self.n] = duration
+        self.ids[self.n] = name_id
+        self.n += 1
+
+    def add(self, name, start, duration):
+        self.add_id(self.name_id(name), start, duration)
+
+    def span(self, name):
+        """Returns a context manager recording the time spent in its body.
+
+        Spans are reused per name, so spans of the same name must not
+        be nested.
+
+        """
+        if not self.enabled:
+            return NULL_SPAN
+        if name not in self._spans:
+            self._spans[name] = Span(self, name)
+        return self._spans[name]
+
+    def hop(self, name, ts, now=None):
+        """Records a message sent at wall-clock time `ts` and arriving now as span `name`.
+
+        """
+        if not self.enabled:
+            return
+        now = self.clock() if now is None else now
+        name_id = self.name_id(name)
+        self.hops.add(name_id)
+        self.add_id(name_id, ts - self.offset, now - (ts - self.offset))
+
+    def summary(self):
+        """Returns count, total, mean, 99th percentile and maximum duration (in s) per span name.
+
+        """
+        summary = collections.OrderedDict()
+        ids = self.ids[:self.n]
+        durations = self.durations[:self.n]
+        for name_id, name in enumerate(self.names):
+            d = durations[ids == name_id]
+            summary[name] = collections.OrderedDict([
+                ('n', len(d)),
+                ('total', float(d.sum())),
+                ('mean', float(d.mean()) if len(d) else np.nan),
+                ('p99', float(np.percentile(d, 99)) if len(d) else np.nan),
+                ('max', float(d.max()) if len(d) else np.nan),
+            ])
+        return summary
+
+    def report(self):
+        """Returns the time per span name in milliseconds, one line each.
+
+        """
+        lines = []
+        for name, s in self.summary().items():
+            lines.append('{:>16}: {:7d} x, mean {:8.3f} ms, p99 {:8.3f} ms, max {:8.3f} ms, total {:9.1f} ms'.format(
+                name, s['n'], s['mean'] * 1e3, s['p99'] * 1e3, s['max'] * 1e3, s['total'] * 1e3))
+        if self.n_overflow:
+            lines.append('{} spans not recorded, capacity exceeded'.format(self.n_overflow))
+        return '\n'.join(lines)
+
+    def events(self):
+        """Returns the spans as Chrome trace events, with timestamps in wall-clock microseconds.
+
+        Spans of the loop share one track, every hop gets a track of
+        its own, since hops overlap each other and the loop.
+
+        """
+        pid = os.getpid()
+        events = [{'name': 'process_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': self.process}},
+                  {'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': 0, 'args': {'name': 'loop'}}]
+        for name_id in sorted(self.hops):
+            events.append({'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': name_id + 1, 'args': {'name': self.names[name_id]}})
+        starts = (self.starts[:self.n] + self.offset) * 1e6
+        durations = self.durations[:self.n] * 1e6
+        for name_id, start, duration in zip(self.ids[:self.n].tolist(), starts.tolist(), durations.tolist()):
+            events.append({'name': self.names[name_id], 'ph': 'X', 'ts': start, 'dur': duration, 'pid': pid,
+                           'tid': name_id + 1 if name_id in self.hops else 0})
+        return events
+
+    def write(self, fname):
+        """Writes the spans to `fname` in the Chrome trace JSON format.
+
+        """
+        with open(fname, 'w') as f:
+            json.dump({'traceEvents': self.events(), 'displayTimeUnit': 'ms'}, f)
+
+
+NULL_SPAN = NullSpan()
+
+
+class Tap(object):
+    """Pass-through stage recording the hop of every message arriving at a boundary.
+
+    Messages without timestamps and `None` (no new message) are passed
+    on without being recorded.
+
+    """
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __call__(self, msg):
+        if msg is not None and not np.isnan(msg['ts']).all():
+            self.profiler.hop(self.name, np.nanmax(msg['ts']))
+        return msg
+
+    def reset(self):
+        pass
+
+
+def merge(fnames, out):
+    """Combines the Chrome traces `fnames` of several processes into `out`.
+
+    """
+    events = []
+    for fname in fnames:
+        with open(fname) as f:
+            events.extend(json.load(f)['traceEvents'])
+    with open(out, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+    return events
+
+
+def breakdown(events):
+    """Returns the total duration (in s) and number of spans per process and span name.
+
+    """
+    processes = {e['pid']: e['args']['name'] for e in events if e['ph'] == 'M' and e['name'] == 'process_name'}
+    totals = collections.OrderedDict()
+    for e in events:
+        if e['ph'] == 'X':
+            key = (processes.get(e['pid'], str(e['pid'])), e['name'])
+            n, total = totals.get(key, (0, 0.))
+            totals[key] = (n + 1, total + e['dur'] * 1e-6)
+    return totals
+
+
+def tap(hops, t_max, profiler):
+    """Records the hops of all messages published on the addresses of `hops` (name -> address).
+
+    """
+    from .aio import AsyncReceiver
+
+    receiver = AsyncReceiver(list(hops.values()))
+    taps = {addr: Tap(profiler, name) for name, addr in hops.items()}
+
+    async def receive():
+        async for addr, msg in receiver:
+            taps[addr](msg)
+
+    loop = asyncio.get_event_loop()
+    try:
+        loop.run_until_complete(asyncio.wait_for(receive(), t_max))
+    except asyncio.TimeoutError:
+        pass
+    receiver.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Record and combine per-stage Chrome traces of the closed loop.')
+    commands = parser.add_subparsers(dest='command')
+    tap_parser = commands.add_parser('tap', help='record the hops of messages published on ZMQ ports')
+    tap_parser.add_argument('hops', nargs='+', metavar='NAME=ADDR', help='hop name and address to subscribe to')
+    tap_parser.add_argument('--t-max', type=float, default=10., help='recording duration in seconds')
+    tap_parser.add_argument('--out', default='trace_hops.json', help='Chrome trace file to write')
+    merge_parser = commands.add_parser('merge', help='combine the traces of several processes and print the time per stage')
+    merge_parser.add_argument('traces', nargs='+', help='Chrome trace files')
+    merge_parser.add_argument('--out', default='trace.json', help='combined Chrome trace file to write')
+    args = parser.parse_args()
+
+    if args.command == 'tap':
+        profiler = Profiler('tap', capacity=1000000)
+        tap(collections.OrderedDict(hop.split('=', 1) for hop in args.hops), args.t_max, profiler)
+        print(profiler.report())
+        profiler.write(args.out)
+    elif args.command == 'merge':
+        events = merge(args.traces, args.out)
+        for (process, name), (n, total) in breakdown(events).items():
+            print('{:>12} {:>16}: {:7d} x, total {:9.1f} ms'.format(process, name, n, total * 1e3))
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
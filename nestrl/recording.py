@@ -0,0 +1,209 @@
+"""Streaming recorded events of NEST devices to disk.
+
+Calling ``nest.Simulate`` once and reading all events at the end keeps
+the whole history in memory and shows nothing until the run finished.
+`Recording` instead advances the simulation in chunks
+(``nest.Prepare``/``nest.Run``/``nest.Cleanup``), appends the events of
+every device to column files after each chunk and clears the device
+buffers, so memory stays flat independent of the length of a run.
+
+Each device is stored in its own directory holding one raw binary file
+per column (e.g. ``times``, ``senders``, ``V_m``) and a ``meta.json``
+with dtypes and the number of rows written so far. `load` maps the
+columns into memory with ``np.memmap``, also while a run is ongoing.
+With several MPI ranks, every rank writes to its own subdirectory
+``rank<i>``; `load_all` combines them. Stores of an earlier run below
+the same path are removed when a `Recording` starts, so they do not
+mix with those of the current run.
+
+"""
+
+import collections
+import json
+import os
+import re
+import shutil
+
+import numpy as np
+
+from .profiler import Profiler
+
+# dtypes of event columns, all others are stored as float64
+DTYPES = {'senders': '<i8'}
+
+
+class ColumnStore(object):
+    """Append-only store of equally long columns.
+
+    """
+
+    def __init__(self, path, columns):
+        self.path = path
+        self.columns = collections.OrderedDict((c, np.dtype(DTYPES.get(c, '<f8'))) for c in columns)
+        self.n = 0
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        self._files = {c: open(os.path.join(path, c + '.bin'), 'wb') for c in self.columns}
+        self._write_meta()
+
+    def append(self, data):
+        """Appends the columns in `data` (dictionary of arrays) to the store.
+
+        """
+        n = len(data[next(iter(self.columns))])
+        for c, dtype in self.columns.items():
+            values = np.ascontiguousarray(data[c], dtype=dtype)
+            if len(values) != n:
+                raise ValueError('column {!r} has {} rows, expected {}'.format(c, len(values), n))
+            self._files[c].write(memoryview(values))
+        self.n += n
+
+    def flush(self):
+        for f in self._files.values():
+            f.flush()
+        self._write_meta()
+
+    def close(self):
+        self.flush()
+        for f in self._files.values():
+            f.close()
+
+    def _write_meta(self):
+        meta = {'n': self.n, 'columns': collections.OrderedDict((c, dtype.str) for c, dtype in self.columns.items())}
+        tmp = os.path.join(self.path, 'meta.json.tmp')
+        with open(tmp, 'w') as f:
+            json.dump(meta, f)
+        os.replace(tmp, os.path.join(self.path, 'meta.json'))
+
+
+def remove_stores(path, n_ranks=None):
+    """Removes the stores directly below `path` and the ``rank<i>`` subdirectories with ``i >= n_ranks``.
+
+    With `n_ranks=None`, only stores are removed. Other files are left
+    untouched.
+
+    """
+    if not os.path.isdir(path):
+        return
+    for name in os.listdir(path):
+        store = os.path.join(path, name)
+        if os.path.isfile(os.path.join(store, 'meta.json')):
+            shutil.rmtree(store)
+        elif n_ranks is not None and re.match(r'^rank\d+$', name) and int(name[4:]) >= n_ranks and os.path.isdir(store):
+            shutil.rmtree(store)
+
+
+def load_all(path):
+    """Maps all stores below `path` into memory.
+
+    Stores written by several MPI ranks (in subdirectories ``rank<i>``)
+    are concatenated. Returns a dictionary mapping store names to
+    dictionaries of columns.
+
+    """
+    stores = collections.OrderedDict()
+    ranks = sorted(d for d in os.listdir(path) if d.startswith('rank') and os.path.isdir(os.path.join(path, d)))
+    for rank_path in [os.path.join(path, d) for d in ranks] or [path]:
+        for name in sorted(os.listdir(rank_path)):
+            if os.path.isfile(os.path.join(rank_path, name, 'meta.json')):
+                stores.setdefault(name, []).append(load(os.path.join(rank_path, name)))
+    return collections.OrderedDict(
+        (name, parts[0] if len(parts) == 1 else collections.OrderedDict((c, np.concatenate([p[c] for p in parts])) for c in parts[0]))
+        for name, parts in stores.items())
+
+
+def load(path):
+    """Maps all columns of a store into memory.
+
+    Returns a dictionary of read-only arrays holding the rows flushed
+    so far.
+
+    """
+    with open(os.path.join(path, 'meta.json')) as f:
+        meta = json.load(f, object_pairs_hook=collections.OrderedDict)
+    columns = collections.OrderedDict()
+    for c, dtype in meta['columns'].items():
+        if meta['n'] == 0:
+            columns[c] = np.empty(0, dtype=dtype)
+        else:
+            columns[c] = np.memmap(os.path.join(path, c + '.bin'), dtype=dtype, mode='r', shape=(meta['n'],))
+    return columns
+
+
+class Recording(object):
+    """Streams the events of NEST recording devices to column stores below `path`.
+
+    `devices` maps a name to a tuple of the device (as returned by
+    ``nest.Create``) and the event columns to store, e.g.
+    ``{'spikes': (sd, ['times', 'senders'])}``.
+
+    """
+
+    def __init__(self, path, devices):
+        import nest
+
+        # every rank records the events of its local neurons; the first
+        # rank removes what an earlier run on a different number of
+        # ranks left, every rank the stores of its own directory
+        n_ranks = nest.NumProcesses()
+        if nest.Rank() == 0:
+            remove_stores(path, n_ranks if n_ranks > 1 else 0)
+        if n_ranks > 1:
+            path = os.path.join(path, 'rank{}'.format(nest.Rank()))
+            remove_stores(path)
+        self.path = path
+        self.devices = collections.OrderedDict()
+        self.stores = collections.OrderedDict()
+        for name, (device, columns) in devices.items():
+            self.devices[name] = device
+            self.stores[name] = ColumnStore(os.path.join(path, name), columns)
+
+    def drain(self):
+        """Appends the events of all devices to their stores and clears the devices.
+
+        """
+        import nest
+
+        for name, device in self.devices.items():
+            self.stores[name].append(nest.GetStatus(device, 'events')[0])
+            nest.SetStatus(device, {'n_events': 0})
+            self.stores[name].flush()
+
+    def simulate(self, simtime, chunk, callback=None, interval=None, profiler=None):
+        """Simulates for `simtime` ms in chunks of `chunk` ms, draining after each chunk.
+
+        If given, `callback()` is called every `interval` ms, which needs
+        to divide `chunk`. With a `nestrl.profiler.Profiler`, the time
+        spent in ``nest.Run``, the callback and draining is recorded.
+
+        """
+        import nest
+
+        profiler = profiler if profiler is not None else Profiler(enabled=False)
+
+        if callback is None:
+            interval = chunk
+        per_chunk = max(1, int(round(chunk / interval)))
+        n_steps = int(np.ceil(simtime / interval - 1e-9))
+
+        nest.Prepare()
+        for i in range(n_steps):
+            with profiler.span('nest.Run'):
+                nest.Run(min(interval, simtime - i * interval))
+            if callback is not None:
+                with profiler.span('callback'):
+                    callback()
+            if (i + 1) % per_chunk == 0 or i == n_steps - 1:
+                with profiler.span('drain'):
+                    self.drain()
+        nest.Cleanup()
+
+    def close(self):
+        for store in self.stores.values():
+            store.close()
+
+    def load(self, name):
+        """Maps the columns recorded from device `name` into memory.
+
+        """
+        return load(os.path.join(self.path, name))
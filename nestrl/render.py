@@ -0,0 +1,127 @@
+"""Plotting of recorded runs, independent of their length.
+
+Plotting every sample and every spike makes rendering time grow with
+the length of a run. Here, membrane potential traces are reduced to
+their minimum and maximum within every pixel column (which looks the
+same as drawing all samples) and spikes are counted in a histogram
+with one bin per pixel column and sender, so the cost of drawing only
+depends on the size of the output.
+
+Run it on the ``recording/`` directory written by `nestrl.recording`
+after the simulation finished::
+
+    $ python -m nestrl.render recording -o nest_output.png
+
+"""
+
+import argparse
+
+import numpy as np
+
+from . import recording
+
+
+def decimate_minmax(times, values, n_bins, t_start, t_stop):
+    """Reduces a trace to its minimum and maximum in `n_bins` time bins.
+
+    `times` need to be sorted. Returns bin centers, minima and maxima;
+    empty bins are dropped. Traces shorter than `n_bins` are returned
+    unchanged (with identical minima and maxima).
+
+    """
+    times = np.asarray(times)
+    values = np.asarray(values)
+    if len(times) <= n_bins:
+        return times, values, values
+
+    edges = np.linspace(t_start, t_stop, n_bins + 1)
+    stop = np.searchsorted(times, t_stop, side='right')
+    idx = np.searchsorted(times[:stop], edges[:-1], side='left')
+    nonempty = np.diff(np.append(idx, stop)) > 0
+    idx = idx[nonempty]
+    centers = 0.5 * (edges[:-1] + edges[1:])[nonempty]
+    values = values[:stop]
+    return centers, np.minimum.reduceat(values, idx), np.maximum.reduceat(values, idx)
+
+
+def bin_spikes(times, senders, n_bins, t_start, t_stop):
+    """Counts spikes per sender in `n_bins` time bins.
+
+    Spikes outside ``[t_start, t_stop]`` are not counted; as with
+    ``np.histogram``, the last bin includes `t_stop`. Returns the counts
+    (senders x bins), the bin edges and the sorted sender ids.
+
+    """
+    ids, rows = np.unique(senders, return_inverse=True)
+    edges = np.linspace(t_start, t_stop, n_bins + 1)
+    times = np.asarray(times)
+    inside = (times >= t_start) & (times <= t_stop)
+    rows = rows[inside]
+    cols = np.minimum(((times[inside] - t_start) / (t_stop - t_start) * n_bins).astype(np.int64), n_bins - 1)
+    counts = np.bincount(rows * n_bins + cols, minlength=len(ids) * n_bins).reshape(len(ids), n_bins)
+    return counts, edges, ids
+
+
+def render(path, fname, t_stop=None, width=6.4, height=4.8, dpi=300, labels=None):
+    """Plots all spike and membrane potential recordings found below `path`.
+
+    """
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+
+    stores = recording.load_all(path)
+    spikes = {name: s for name, s in stores.items() if 'senders' in s and 'V_m' not in s}
+    traces = {name: s for name, s in stores.items() if 'V_m' in s}
+
+    if t_stop is None:
+        t_stop = max([s['times'].max() for s in stores.values() if len(s['times']) > 0] + [1.])
+    n_bins = int(width * dpi)
+
+    fig = plt.figure(figsize=(width, height))
+    n_rows = len(spikes) + int(len(traces) > 0)
+
+    for row, (name, s) in enumerate(spikes.items()):
+        ax = fig.add_subplot(n_rows, 1, row + 1)
+        counts, edges, ids = bin_spikes(s['times'], s['senders'], n_bins, 0., t_stop)
+        ax.imshow(counts > 0, aspect='auto', interpolation='nearest', cmap='Greys', vmin=0, vmax=1, origin='lower', extent=[0., t_stop, -0.5, len(ids) - 0.5])
+        ax.set_yticks(np.arange(len(ids)))
+        ax.set_yticklabels(labels if labels is not None and len(labels) == len(ids) else ids)
+        ax.set_xlim([0., t_stop])
+        ax.set_title(name, fontsize=8)
+
+    if traces:
+        ax = fig.add_subplot(n_rows, 1, n_rows)
+        for name, s in traces.items():
+            # multimeters recording from several neurons interleave their samples
+            senders = np.unique(s['senders']) if 'senders' in s else [None]
+            for sender in senders:
+                mask = slice(None) if sender is None else s['senders'] == sender
+                t, v_min, v_max = decimate_minmax(s['times'][mask], s['V_m'][mask], n_bins, 0., t_stop)
+                label = name if len(senders) == 1 else '{} ({})'.format(name, sender)
+                lines = ax.plot(t, v_min, lw=0.5, label=label)
+                ax.fill_between(t, v_min, v_max, color=lines[0].get_color(), lw=0.)
+        ax.set_xlim([0., t_stop])
+        ax.set_ylabel('Membrane potential (mV)')
+        ax.legend(fontsize=8)
+    fig.axes[-1].set_xlabel('Time (ms)')
+
+    fig.savefig(fname, dpi=dpi)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Plot a recorded run.')
+    parser.add_argument('path', help='directory written by nestrl.recording')
+    parser.add_argument('-o', '--out', default='nest_output.png')
+    parser.add_argument('--t-stop', type=float, default=None, help='end of the plotted interval in ms')
+    parser.add_argument('--width', type=float, default=6.4, help='figure width in inches')
+    parser.add_argument('--height', type=float, default=4.8, help='figure height in inches')
+    parser.add_argument('--dpi', type=int, default=300)
+    parser.add_argument('--labels', default=None, help='comma-separated labels of the spiking neurons in order of their ids')
+    args = parser.parse_args()
+
+    render(args.path, args.out, args.t_stop, args.width, args.height, args.dpi, args.labels.split(',') if args.labels else None)
+
+
+if __name__ == '__main__':
+    main()
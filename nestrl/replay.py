@@ -0,0 +1,271 @@
+"""Capturing message streams and replaying them without an environment.
+
+Every run with a live gymz environment or a noisy sender sees different
+input, and runs no faster than real time. `capture` subscribes to the
+ports of the toolchain (e.g. the observations of gymz and the commands
+of the ``cont_zmq_adapter``) and appends every frame, as received and
+without decoding it, to a compact binary log together with its arrival
+time. `replay` publishes the frames again on the original ports,
+either with their original timing (scaled by `speed`) or as fast as
+possible, so benchmarks see identical input without an environment in
+the loop::
+
+    $ python -m nestrl.replay capture gym=tcp://localhost:5556 cont_zmq=tcp://localhost:5555 --out episode.nrlog
+    $ python -m nestrl.replay play episode.nrlog --streams gym
+    $ python -m nestrl.replay play episode.nrlog --streams gym --asap
+
+A log starts with ``MAGIC``, the length of a JSON header listing the
+streams (name and address) and the header itself, followed by one
+record per frame: a `RECORD` (arrival time in s since the start of the
+capture, stream index, length of the topic and of the frame) and the
+topic and frame bytes.
+
+Receivers with a `nestrl.freshness.Freshness` ``max_age`` would drop
+messages carrying the ``ts`` of the capture as stale, so a timed
+replay decodes every frame and sends it again in its format with the
+current time as ``ts``. Frames are sent as captured with ``--keep-ts``
+(``restamp_ts=False``), and by default when sending as fast as
+possible, where the cost of restamping would limit the rate.
+
+"""
+
+import argparse
+import collections
+import json
+import os
+import re
+import struct
+import time
+
+import numpy as np
+import zmq
+
+from . import codec
+
+MAGIC = b'NRLOG1'
+HEADER_SIZE = struct.Struct('<I')
+RECORD = struct.Struct('<dHHI')  # arrival time, stream, topic length, frame length
+
+Frame = collections.namedtuple('Frame', ['t', 'stream', 'topic', 'frame'])
+
+
+class LogWriter(object):
+    """Appends frames of the named `streams` (name -> address) to the log `fname`.
+
+    """
+
+    def __init__(self, fname, streams):
+        self.streams = collections.OrderedDict(streams)
+        self.index = {name: i for i, name in enumerate(self.streams)}
+        self.f = open(fname, 'wb')
+        header = json.dumps({'streams': [{'name': name, 'addr': addr} for name, addr in self.streams.items()]}).encode()
+        self.f.write(MAGIC + HEADER_SIZE.pack(len(header)) + header)
+        self.n = 0
+
+    def write(self, t, stream, frame, topic=b''):
+        self.f.write(RECORD.pack(t, self.index[stream], len(topic), len(frame)))
+        self.f.write(topic)
+        self.f.write(frame)
+        self.n += 1
+
+    def close(self):
+        self.f.close()
+
+
+def read(fname):
+    """Returns the streams (name -> address) and the frames of the log `fname`.
+
+    Topics and frames are read-only views into the log.
+
+    """
+    buf = memoryview(np.memmap(fname, dtype=np.uint8, mode='r')) if os.path.getsize(fname) > 0 else memoryview(b'')
+    if bytes(buf[:len(MAGIC)]) != MAGIC:
+        raise ValueError('{} is not a message log'.format(fname))
+    offset = len(MAGIC)
+    (header_size,) = HEADER_SIZE.unpack_from(buf, offset)
+    offset += HEADER_SIZE.size
+    header = json.loads(bytes(buf[offset:offset + header_size]).decode())
+    offset += header_size
+    streams = collections.OrderedDict((s['name'], s['addr']) for s in header['streams'])
+    names = list(streams)
+
+    frames = []
+    while offset + RECORD.size <= len(buf):
+        t, stream, topic_size, frame_size = RECORD.unpack_from(buf, offset)
+        offset += RECORD.size
+        if offset + topic_size + frame_size > len(buf):
+            break  # truncated by an interrupted capture
+        topic = buf[offset:offset + topic_size]
+        frame = buf[offset + topic_size:offset + topic_size + frame_size]
+        offset += topic_size + frame_size
+        frames.append(Frame(t, names[stream], topic, frame))
+    return streams, frames
+
+
+def capture(streams, fname, t_max, ctx=None):
+    """Records all frames published on the addresses of `streams` (name -> address) for `t_max` seconds.
+
+    Returns the number of frames per stream.
+
+    """
+    ctx = zmq.Context.instance() if ctx is None else ctx
+    writer = LogWriter(fname, streams)
+    poller = zmq.Poller()
+    names = {}
+    for name, addr in writer.streams.items():
+        sock = ctx.socket(zmq.SUB)
+        sock.connect(addr)
+        sock.setsockopt(zmq.SUBSCRIBE, b'')
+        poller.register(sock, zmq.POLLIN)
+        names[sock] = name
+
+    counts = collections.OrderedDict((name, 0) for name in writer.streams)
+    t_start = time.perf_counter()
+    try:
+        while True:
+            remaining = t_max - (time.perf_counter() - t_start)
+            if remaining <= 0.:
+                break
+            for sock, _ in poller.poll(int(remaining * 1e3) + 1):
+                while True:
+                    try:
+                        frames = sock.recv_multipart(zmq.NOBLOCK, copy=False)
+                    except zmq.error.Again:
+                        break
+                    t = time.perf_counter() - t_start
+                    topic = frames[0].bytes if len(frames) > 1 else b''
+                    writer.write(t, names[sock], frames[-1].buffer, topic)
+                    counts[names[sock]] += 1
+    finally:
+        writer.close()
+        for sock in names:
+            sock.close(linger=0)
+    return counts
+
+
+def bind_address(addr):
+    """Returns the address to bind for replaying frames captured from `addr`, e.g. ``tcp://*:5556`` for ``tcp://localhost:5556``.
+
+    """
+    return re.sub(r'^tcp://[^:]+:', 'tcp://*:', addr)
+
+
+def restamp(frame, now):
+    """Returns `frame` encoded again in its format with ``ts`` set to `now`.
+
+    """
+    if codec.is_binary(frame):
+        message_type, msg = codec.decode_binary(frame)
+        if isinstance(msg, codec.SpikeBatch):
+            return frame
+        msg = msg.copy()
+        msg['ts'] = now
+        return codec.encode_binary(msg, message_type)
+    msg = codec.decode(frame)
+    msg['ts'] = now
+    return json.dumps(codec.encode_json(msg)).encode()
+
+
+def replay(fname, streams=None, binds=None, speed=1., restamp_ts=None, wait=5., ctx=None):
+    """Publishes the frames of the log `fname` again.
+
+    Only the `streams` given (default all) are replayed, each on the
+    address in `binds` (name -> address) or on `bind_address` of its
+    original address. With `speed=None`, frames are sent as fast as
+    possible, nothing is dropped and the order of frames is kept;
+    otherwise frame `k` is sent at its arrival time divided by `speed`.
+    With `restamp_ts` (by default unless `speed=None`), the ``ts`` of
+    every message is set to the time it is sent. Replay starts once every stream has a subscriber, or after `wait`
+    seconds. Returns the number of frames sent and the wall-clock time
+    it took.
+
+    """
+    ctx = zmq.Context.instance() if ctx is None else ctx
+    if restamp_ts is None:
+        restamp_ts = speed is not None
+    all_streams, frames = read(fname)
+    streams = list(all_streams) if streams is None else list(streams)
+    binds = binds or {}
+    sockets = {}
+    for name in streams:
+        # XPUB sockets report subscriptions, so replay does not start
+        # before the subscribers have connected
+        sock = ctx.socket(zmq.XPUB)
+        if speed is None:
+            sock.setsockopt(zmq.SNDHWM, 0)
+        sock.bind(binds.get(name, bind_address(all_streams[name])))
+        sockets[name] = sock
+
+    deadline = time.monotonic() + wait
+    pending = set(streams)
+    while pending and time.monotonic() < deadline:
+        for name in list(pending):
+            if sockets[name].poll(10, zmq.POLLIN):
+                sockets[name].recv()
+                pending.discard(name)
+
+    n = 0
+    t_start = time.monotonic()
+    for frame in frames:
+        if frame.stream not in sockets:
+            continue
+        if speed is not None:
+            delay = t_start + frame.t / speed - time.monotonic()
+            if delay > 0.:
+                time.sleep(delay)
+        data = restamp(frame.frame, time.time()) if restamp_ts else frame.frame
+        sock = sockets[frame.stream]
+        if len(frame.topic) > 0:
+            sock.send(frame.topic, zmq.SNDMORE)
+        sock.send(data, copy=False)
+        n += 1
+    wall = time.monotonic() - t_start
+
+    # give queued frames time to leave
+    for sock in sockets.values():
+        sock.close(linger=10000)
+    return n, wall
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Capture message streams of the toolchain and replay them.')
+    commands = parser.add_subparsers(dest='command')
+    capture_parser = commands.add_parser('capture', help='record the frames published on ZMQ ports')
+    capture_parser.add_argument('streams', nargs='+', metavar='NAME=ADDR', help='stream name and address to subscribe to')
+    capture_parser.add_argument('--t-max', type=float, default=10., help='recording duration in seconds')
+    capture_parser.add_argument('--out', default='capture.nrlog', help='log file to write')
+    play_parser = commands.add_parser('play', help='publish the frames of a log again')
+    play_parser.add_argument('log', help='log file')
+    play_parser.add_argument('--streams', default=None, help='comma-separated names of the streams to replay, default all')
+    play_parser.add_argument('--bind', action='append', default=[], metavar='NAME=ADDR', help='address to publish a stream on, default its original port')
+    play_parser.add_argument('--speed', type=float, default=1., help='factor applied to the original timing')
+    play_parser.add_argument('--asap', action='store_true', help='send as fast as possible, ignoring the original timing')
+    play_parser.add_argument('--restamp', action='store_true', help='set ts of every message to the time it is replayed, also with --asap')
+    play_parser.add_argument('--keep-ts', action='store_true', help='send messages with the ts of the capture, which receivers with a max_age drop as stale')
+    play_parser.add_argument('--wait', type=float, default=5., help='seconds to wait for subscribers')
+    info_parser = commands.add_parser('info', help='print the streams of a log')
+    info_parser.add_argument('log', help='log file')
+    args = parser.parse_args()
+
+    if args.command == 'capture':
+        streams = collections.OrderedDict(stream.split('=', 1) for stream in args.streams)
+        counts = capture(streams, args.out, args.t_max)
+        print('captured', ', '.join('{} {}'.format(n, name) for name, n in counts.items()), 'frames to', args.out)
+    elif args.command == 'play':
+        streams = args.streams.split(',') if args.streams else None
+        binds = dict(bind.split('=', 1) for bind in args.bind)
+        restamp_ts = True if args.restamp else False if args.keep_ts else None
+        n, wall = replay(args.log, streams, binds, None if args.asap else args.speed, restamp_ts, args.wait)
+        print('replayed {} frames in {:.3f} s'.format(n, wall))
+    elif args.command == 'info':
+        streams, frames = read(args.log)
+        for name, addr in streams.items():
+            times = [frame.t for frame in frames if frame.stream == name]
+            duration = times[-1] - times[0] if times else 0.
+            print('{}: {}, {} frames over {:.3f} s'.format(name, addr, len(times), duration))
+    else:
+        parser.print_help()
+
+
+if __name__ == '__main__':
+    main()
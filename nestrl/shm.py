@@ -0,0 +1,194 @@
+"""Single-producer/single-consumer ring buffer in shared memory.
+
+For components on the same host, even ``ipc://`` sockets copy every
+message through the kernel. A `Ring` instead holds a fixed number of
+fixed-size slots in a ``multiprocessing.shared_memory`` block, each
+holding one binary frame of `nestrl.codec`. The producer writes a
+frame into the next free slot and then advances the write counter; the
+consumer copies the frame out of the oldest slot and then advances the
+read counter. Each counter is only ever written by one side, so no
+locks are needed: the counters are aligned 64 bit integers on separate
+cache lines, whose stores are atomic and, on x86, become visible in
+program order.
+
+There is no notification; the consumer polls. If the ring is full,
+`RingWriter.send` drops the new frame (or waits, with `block=True`).
+
+Rings are addressed as ``shm://<name>``. The writer creates (and on
+`close` removes) the shared memory block, so it needs to be started
+before the reader.
+
+"""
+
+import os
+import time
+
+import numpy as np
+
+from . import codec
+
+SCHEME = 'shm://'
+
+_yield = getattr(os, 'sched_yield', lambda: time.sleep(0.))
+
+# counters on separate cache lines, followed by the layout of the ring
+WRITE = 0
+READ = 8
+SLOT_SIZE = 16
+CAPACITY = 17
+HEADER_SIZE = 8 * 18
+
+
+def name_of(addr):
+    """Returns the name of the shared memory block of an ``shm://`` address.
+
+    """
+    if not addr.startswith(SCHEME):
+        raise ValueError('not a shared memory address: {!r}'.format(addr))
+    return addr[len(SCHEME):]
+
+
+def _attach(name):
+    """Attaches to an existing shared memory block without taking ownership.
+
+    Only the creator may remove the block (see `RingWriter.close`), but
+    before Python 3.13 attaching registers it with the resource tracker,
+    which removes it once the attaching process exits.
+
+    """
+    from multiprocessing import resource_tracker, shared_memory
+
+    try:
+        return shared_memory.SharedMemory(name, track=False)
+    except TypeError:
+        register = resource_tracker.register
+        resource_tracker.register = lambda name, rtype: None
+        try:
+            return shared_memory.SharedMemory(name)
+        finally:
+            resource_tracker.register = register
+
+
+class Ring(object):
+    """Shared memory block holding the counters and slots of a ring.
+
+    """
+
+    def __init__(self, addr, n_channels=None, capacity=64):
+        from multiprocessing import shared_memory
+
+        name = name_of(addr)
+        if n_channels is not None:
+            slot_size = codec.frame_size(n_channels)
+            self.shm = shared_memory.SharedMemory(name, create=True, size=HEADER_SIZE + capacity * slot_size)
+            self.header = np.ndarray(HEADER_SIZE // 8, dtype=np.uint64, buffer=self.shm.buf)
+            self.header[:] = 0
+            self.header[SLOT_SIZE] = slot_size
+            self.header[CAPACITY] = capacity
+        else:
+            self.shm = _attach(name)
+            self.header = np.ndarray(HEADER_SIZE // 8, dtype=np.uint64, buffer=self.shm.buf)
+        self.slot_size = int(self.header[SLOT_SIZE])
+        self.capacity = int(self.header[CAPACITY])
+
+    def slot(self, i):
+        offset = HEADER_SIZE + (i % self.capacity) * self.slot_size
+        return self.shm.buf[offset:offset + self.slot_size]
+
+    def close(self):
+        # views into the block need to be released before closing it
+        del self.header
+        self.shm.close()
+
+
+class RingWriter(object):
+    """Producer side of a ring with `capacity` slots of `n_channels` channels.
+
+    """
+
+    def __init__(self, addr, n_channels, capacity=64):
+        self.ring = Ring(addr, n_channels, capacity)
+        self.n_channels = n_channels
+        self.n_sent = 0
+        self.n_dropped = 0
+
+    def send(self, msg, message_type=codec.OBSERVATION, block=False):
+        """Writes `msg` to the next free slot; returns whether it was written.
+
+        If the ring is full, the message is dropped, or with `block`,
+        written as soon as the consumer freed a slot.
+
+        """
+        if len(msg) > self.n_channels:
+            raise ValueError('message has {} channels, the ring holds {}'.format(len(msg), self.n_channels))
+        header = self.ring.header
+        write = int(header[WRITE])
+        while write - int(header[READ]) >= self.ring.capacity:
+            if not block:
+                self.n_dropped += 1
+                return False
+            _yield()
+        codec.encode_binary(msg, message_type, out=self.ring.slot(write))
+        header[WRITE] = write + 1
+        self.n_sent += 1
+        return True
+
+    def close(self):
+        shm = self.ring.shm
+        self.ring.close()
+        shm.unlink()
+
+
+class RingReader(object):
+    """Consumer side of the ring created by a `RingWriter` at `addr`.
+
+    """
+
+    def __init__(self, addr):
+        self.ring = Ring(addr)
+        self.n_received = 0
+
+    def poll(self):
+        """Returns the next message, or `None` if the ring is empty.
+
+        """
+        header = self.ring.header
+        read = int(header[READ])
+        if read == int(header[WRITE]):
+            return None
+        msg = codec.decode_binary(self.ring.slot(read))[1].copy()
+        header[READ] = read + 1
+        self.n_received += 1
+        return msg
+
+    def recv(self, timeout=None, interval=0.):
+        """Waits up to `timeout` seconds for the next message, polling every `interval` seconds.
+
+        Returns `None` on timeout. With `interval=0.` it spins, yielding
+        the CPU between polls, which gives the lowest latency at the cost
+        of one busy core.
+
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            msg = self.poll()
+            if msg is not None or (deadline is not None and time.monotonic() >= deadline):
+                return msg
+            if interval > 0.:
+                time.sleep(interval)
+            else:
+                _yield()
+
+    def drain(self):
+        """Returns all pending messages.
+
+        """
+        messages = []
+        msg = self.poll()
+        while msg is not None:
+            messages.append(msg)
+            msg = self.poll()
+        return messages
+
+    def close(self):
+        self.ring.close()
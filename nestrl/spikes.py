@@ -0,0 +1,174 @@
+"""Publishing raw spikes from NEST and decoding them in Python.
+
+The MUSIC path from spikes to commands (``music_event_out_proxy`` ->
+``linear_decoder`` -> ``cont_zmq_adapter``) filters spikes with an
+exponential kernel of time constant ``tau`` and sends one smoothed
+float per channel, so every command lags behind the network by about
+``tau``. `SpikePublisher` instead sends the spikes of every tick as a
+`codec.SpikeBatch` via ZMQ, and the receiver decodes them with
+
+- `WindowedCounts`: the number of spikes per channel within the last
+  `window` ms, or
+- `FilteredRate`: the exponentially filtered rate of the
+  ``linear_decoder``, but evaluated exactly at the spike times.
+
+Both are vectorized over channels and spikes, so a single batch can
+carry thousands of channels. `CommandPublisher` skips the network
+hop as well: it decodes the spikes within the NEST process, e.g. with
+`nestrl.pipeline.ActionReadout`, and sends the commands to gymz.
+
+"""
+
+import numpy as np
+
+from . import codec
+
+
+def channel_lookup(populations):
+    """Returns an array mapping node ids to the index of their population.
+
+    `populations` is a list of node id tuples, one per channel; node
+    ids not in any population map to -1.
+
+    """
+    ids = np.concatenate([np.asarray(p, dtype=np.int64) for p in populations])
+    channel = np.full(ids.max() + 1, -1, dtype=np.int64)
+    channel[ids] = np.repeat(np.arange(len(populations)), [len(p) for p in populations])
+    return channel
+
+
+class SpikePublisher(object):
+    """Sends the spikes recorded by `detector` as `SpikeBatch` via `sender`.
+
+    `detector` is a spike detector connected to the populations in
+    `populations`, one per channel; `sender` is a
+    `nestrl.transport.Sender` on a ZMQ address (spike batches do not fit
+    the fixed-size slots of shared memory rings). Call it after every
+    ``nest.Run`` to send the spikes since the previous call.
+
+    """
+
+    def __init__(self, detector, populations, sender):
+        self.detector = detector
+        self.channel = channel_lookup(populations)
+        self.sender = sender
+        self.t = 0.  # ms, end of the last batch
+        self.n_spikes = 0
+
+    def __call__(self):
+        import nest
+
+        t_stop = nest.GetKernelStatus('time')
+        events = nest.GetStatus(self.detector, 'events')[0]
+        nest.SetStatus(self.detector, {'n_events': 0})
+        batch = codec.SpikeBatch(self.t, t_stop, events['times'], self.channel[events['senders']])
+        self.sender.send(batch)
+        self.t = t_stop
+        self.n_spikes += len(batch.times)
+
+
+class CommandPublisher(object):
+    """Decodes the spikes recorded by `detector` into commands and sends them via `sender`.
+
+    `decoder` converts the spike counts per channel (one per population
+    in `populations`) since the previous call to a GymCommand, e.g. a
+    `nestrl.pipeline.Pipeline` of the stages of
+    `nestrl.pipeline.readout_from_section`. Call it after every
+    ``nest.Run`` of one ``music_timestep``.
+
+    """
+
+    def __init__(self, detector, populations, decoder, sender):
+        self.detector = detector
+        self.channel = channel_lookup(populations)
+        self.n_channels = len(populations)
+        self.decoder = decoder
+        self.sender = sender
+        self.n_commands = 0
+
+    def __call__(self):
+        import nest
+
+        senders = nest.GetStatus(self.detector, 'events')[0]['senders']
+        nest.SetStatus(self.detector, {'n_events': 0})
+        command = self.decoder(np.bincount(self.channel[senders], minlength=self.n_channels))
+        self.sender.send(command, codec.COMMAND)
+        self.n_commands += 1
+
+
+class WindowedCounts(object):
+    """Counts the spikes of `n_channels` channels within the last `window` ms.
+
+    Spikes are binned in bins of `dt` ms; `window` needs to be a
+    multiple of `dt`. Batches need to arrive in order.
+
+    """
+
+    def __init__(self, n_channels, window, dt):
+        self.dt = float(dt)
+        self.window = float(window)
+        self.n_bins = int(round(window / dt))
+        self.bins = np.zeros((self.n_bins, n_channels), dtype=np.int64)
+        self.counts = np.zeros(n_channels, dtype=np.int64)
+        self.k = 0  # index of the next bin to be filled
+
+    def __call__(self, batch):
+        """Adds a batch and returns the counts per channel at its end.
+
+        """
+        k_stop = int(round(batch.t_stop / self.dt))
+
+        # bins leaving the window
+        expired = np.arange(max(self.k, k_stop - self.n_bins), k_stop) % self.n_bins
+        self.counts -= self.bins[expired].sum(axis=0)
+        self.bins[expired] = 0
+
+        # spike at t falls into the bin (t - dt, t]
+        k = np.ceil(np.asarray(batch.times) / self.dt - 1e-9).astype(np.int64) - 1
+        valid = k >= k_stop - self.n_bins
+        slots = k[valid] % self.n_bins
+        channels = np.asarray(batch.channels, dtype=np.int64)[valid]
+        np.add.at(self.bins, (slots, channels), 1)
+        self.counts += np.bincount(channels, minlength=len(self.counts))
+
+        self.k = k_stop
+        return self.counts
+
+    def rate(self):
+        """Returns the rate (in 1/s) of every channel within the window.
+
+        """
+        return self.counts / self.window * 1e3
+
+    def reset(self):
+        self.bins[:] = 0
+        self.counts[:] = 0
+        self.k = 0
+
+
+class FilteredRate(object):
+    """Filters the spikes of `n_channels` channels with an exponential kernel.
+
+    Like the ``linear_decoder``, every spike adds ``1 / tau`` to the
+    rate (in 1/s), which decays with time constant `tau` (in s).
+
+    """
+
+    def __init__(self, n_channels, tau):
+        self.tau = float(tau) * 1e3  # ms
+        self.rates = np.zeros(n_channels)
+        self.t = 0.  # ms
+
+    def __call__(self, batch):
+        """Adds a batch and returns the rates per channel at its end.
+
+        """
+        self.rates *= np.exp(-(batch.t_stop - self.t) / self.tau)
+        weights = np.exp(-(batch.t_stop - np.asarray(batch.times)) / self.tau) / self.tau * 1e3
+        self.rates += np.bincount(np.asarray(batch.channels, dtype=np.int64), weights, minlength=len(self.rates))
+        self.t = batch.t_stop
+        return self.rates
+
+    def reset(self):
+        self.rates[:] = 0.
+        self.t = 0.
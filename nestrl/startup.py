@@ -0,0 +1,74 @@
+"""Command-line handling and startup timing of the NEST scripts.
+
+MUSIC only starts once every rank reached its barrier, so anything a
+NEST script does before (importing modules, building the network)
+delays every episode. The scripts therefore import plotting libraries
+only after the simulation and only if plots are requested, and report
+their time to the barrier when probed by
+``benchmarks/startup_time.py``.
+
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# set to make `barrier` report the time to barrier and exit instead of synchronizing
+PROBE = 'NESTRL_STARTUP_PROBE'
+
+
+def parse_args(config='config.music'):
+    """Parses the common command-line options of the example scripts.
+
+    MUSIC passes the ``args`` of a section as command-line arguments.
+    `config` is the default MUSIC config of the script.
+
+    """
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--no-plot', action='store_true', help='do not import matplotlib and skip plotting')
+    parser.add_argument('--config', default=config, help='MUSIC config, relative to the script')
+    parser.add_argument('--spikes', default=None, help='ZMQ address to publish the spikes of the output neurons on, e.g. tcp://*:5558')
+    parser.add_argument('--threads', default='1', help='threads per rank, see python -m nestrl.parallel to choose it')
+    parser.add_argument('--profile', default=None, metavar='FILE', help='write a Chrome trace of the time spent per stage to FILE (see nestrl.profiler)')
+    parser.add_argument('--param', action='append', default=[], metavar='NAME=VALUE', help='override a (numeric) network parameter, e.g. J=100.')
+    args, _ = parser.parse_known_args()
+    args.params = {}
+    for param in args.param:
+        name, _, value = param.partition('=')
+        args.params[name] = float(value)
+    return args
+
+
+def process_age():
+    """Returns the time in seconds since the current process was started.
+
+    Uses /proc on Linux (10 ms resolution); elsewhere falls back to the
+    time since this module was imported.
+
+    """
+    try:
+        with open('/proc/self/stat') as f:
+            start_ticks = float(f.read().rsplit(')', 1)[1].split()[19])
+        with open('/proc/uptime') as f:
+            uptime = float(f.read().split()[0])
+        return uptime - start_ticks / os.sysconf('SC_CLK_TCK')
+    except (IOError, OSError, IndexError, ValueError):
+        return time.time() - _T_IMPORT
+
+
+def barrier(comm):
+    """Synchronizes with MUSIC via `comm.Barrier()`.
+
+    If the environment variable ``NESTRL_STARTUP_PROBE`` is set, prints
+    the time to barrier instead and exits.
+
+    """
+    if os.environ.get(PROBE):
+        print('time_to_barrier {:.3f}'.format(process_age()))
+        sys.stdout.flush()
+        sys.exit(0)
+    comm.Barrier()
+
+
+_T_IMPORT = time.time()
@@ -0,0 +1,263 @@
+"""Running parameter sweeps of the closed loop in parallel.
+
+The ZMQ ports of a toolchain are fixed in its MUSIC config, so only one
+toolchain can run per host at a time. The sweep runner renders a
+private copy of the config for every point of a parameter grid into
+its own directory, with free ports in all ``zmq_addr`` entries and
+addresses in ``args`` (e.g. ``--spikes tcp://*:5558``), and
+runs the toolchain together with the `nestrl.mountaincar` environment
+on the matching ports. Runs are executed concurrently, as many as the
+cores can serve given the number of processes per run, and the
+episode statistics of all runs are collected in ``results.csv``::
+
+    $ python -m nestrl.sweep example4/config.music example4/gym_config.json \\
+        --grid J=100,200 --grid tau=0.05,0.1 --grid threshold=0.5,1
+
+Parameters of the network (``J``, ``tau_m``, ``tau_syn``) are passed
+to the NEST script via ``--param``, those of the adapters
+(``rate_max``, ``tau``, ``threshold``) are set in their sections, and
+those of a readout (``window``, ``threshold``, ``hysteresis``, see
+``example4/config_readout.music``) in the nest section. The
+toolchain is started with `command`, by default via MUSIC; with
+``--command "python example4/nest_direct.py --config {config}
+{nest_args}"`` runs use the MUSIC-free driver instead. Runs are
+started in their directories, so arguments of `command` naming
+existing files are made absolute first.
+
+"""
+
+import argparse
+import collections
+import csv
+import itertools
+import json
+import multiprocessing
+import multiprocessing.pool
+import os
+import re
+import shlex
+import socket
+import subprocess
+import sys
+import time
+
+from . import music_config
+
+# parameters passed to the NEST script
+NEST_PARAMS = ('J', 'tau_m', 'tau_syn')
+
+# parameters of the adapters and the binaries of their sections
+SECTION_PARAMS = {
+    'rate_max': 'rate_encoder',
+    'tau': 'linear_decoder',
+    'threshold': 'threshold_adapter',
+}
+
+# parameters of a readout within the nest section, prefixed with readout_
+READOUT_PARAMS = ('window', 'threshold', 'hysteresis')
+
+PARAMETERS = NEST_PARAMS + tuple(SECTION_PARAMS) + tuple(name for name in READOUT_PARAMS if name not in SECTION_PARAMS)
+
+ADDR = re.compile(r'^(\w+)://([^:]+):(\d+)$')
+# addresses within command-line arguments
+ARG_ADDR = re.compile(r'(\w+://[^:\s]+):(\d+)')
+
+COMMAND = 'mpirun -np {np} music {config}'
+
+
+def reserve_port(reserved):
+    """Returns a TCP port that is free on this host and keeps it bound until released.
+
+    The socket holding the port is added to `reserved`, so the port is
+    neither handed out again nor taken by another process before the
+    run it is meant for closes the socket (see `release`) and binds it.
+
+    """
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.bind(('', 0))
+    reserved.append(sock)
+    return sock.getsockname()[1]
+
+
+def release(reserved):
+    """Closes the sockets holding the ports in `reserved`.
+
+    """
+    for sock in reserved:
+        sock.close()
+    del reserved[:]
+
+
+def nest_args(point):
+    """Returns the command-line arguments setting the network parameters of `point`.
+
+    """
+    return ' '.join('--param {}={}'.format(name, point[name]) for name in NEST_PARAMS if name in point)
+
+
+def grid(axes):
+    """Returns all combinations of the values in `axes` (name -> list of values) as dictionaries.
+
+    """
+    names = list(axes)
+    return [collections.OrderedDict(zip(names, values)) for values in itertools.product(*[axes[name] for name in names])]
+
+
+def render(fname, path, point, reserved):
+    """Writes the config `fname` with the parameters of `point` to `path`.
+
+    Ports in ``zmq_addr`` entries and in addresses within ``args`` are
+    replaced by free ones (see `reserve_port`), allocated once per
+    original port, so that sections sharing a port keep doing so.
+    Relative binaries are made absolute. Returns the config.
+
+    """
+    params, sections, edges = music_config.read(fname)
+    ports = {}
+    root = os.path.dirname(os.path.abspath(fname))
+    config_path = os.path.join(path, 'config.music')
+
+    for section in sections.values():
+        for name, binary in SECTION_PARAMS.items():
+            if name in point and section.get('binary') == binary:
+                section[name] = str(point[name])
+        for name in READOUT_PARAMS:
+            if name in point and 'readout_' + name in section:
+                section['readout_' + name] = str(point[name])
+        match = ADDR.match(section.get('zmq_addr', ''))
+        if match:
+            scheme, host, port = match.groups()
+            if port not in ports:
+                ports[port] = reserve_port(reserved)
+            section['zmq_addr'] = '{}://{}:{}'.format(scheme, host, ports[port])
+        if 'args' in section:
+            def remap(match):
+                if match.group(2) not in ports:
+                    ports[match.group(2)] = reserve_port(reserved)
+                return '{}:{}'.format(match.group(1), ports[match.group(2)])
+            section['args'] = ARG_ADDR.sub(remap, section['args'])
+        binary = section.get('binary', '')
+        if binary.startswith('.') or '/' in binary:
+            section['binary'] = os.path.normpath(os.path.join(root, binary))
+
+    sections['nest']['args'] = ' '.join([sections['nest'].get('args', ''), '--config', config_path, nest_args(point)]).strip()
+
+    music_config.write(config_path, params, sections, edges)
+    return music_config.Config(params, sections, [])
+
+
+def run(job):
+    """Renders the config of one point of the sweep, runs it and returns its row of the results table.
+
+    The ports of the run are reserved while rendering and released
+    right before its processes start, so only the runs being started
+    hold sockets, not the whole grid.
+
+    """
+    os.makedirs(job['path'], exist_ok=True)
+    reserved = []
+    config = render(job['config'], job['path'], job['point'], reserved)
+    sections = config.sections
+    obs_port = ADDR.match(sections['zmq_cont'].params['zmq_addr']).group(3)
+    # commands are sent by the cont_zmq adapter or the readout of the nest section
+    cmd_section = sections['cont_zmq'] if 'cont_zmq' in sections else sections['nest']
+    cmd_port = ADDR.match(cmd_section.params['zmq_addr']).group(3)
+
+    env = [sys.executable, '-m', 'nestrl.mountaincar', job['gym_config'],
+           '--cars', str(job['cars']), '--t-max', str(config.stoptime),
+           '--obs-addr', 'tcp://*:{}'.format(obs_port), '--cmd-addr', 'tcp://localhost:{}'.format(cmd_port),
+           '--out', 'statistics.json']
+    command = shlex.split(job['command'].format(np=job['np'], config=os.path.join(job['path'], 'config.music'), nest_args=nest_args(job['point'])))
+    # the run is started in its directory, e.g. example4/nest_direct.py would not be found
+    command = [os.path.abspath(arg) if os.path.isfile(arg) else arg for arg in command]
+
+    # the environment is run as module of this package
+    env_vars = dict(os.environ, PYTHONPATH=os.pathsep.join([os.path.dirname(os.path.dirname(os.path.abspath(__file__))), os.environ.get('PYTHONPATH', '')]))
+    t_start = time.time()
+    release(reserved)
+    with open(os.path.join(job['path'], 'log.txt'), 'w') as log:
+        env_proc = subprocess.Popen(env, cwd=job['path'], stdout=log, stderr=subprocess.STDOUT, env=env_vars)
+        returncode = subprocess.call(command, cwd=job['path'], stdout=log, stderr=subprocess.STDOUT, env=env_vars)
+        env_proc.wait()
+
+    row = collections.OrderedDict([('run', os.path.basename(job['path']))])
+    row.update(job['point'])
+    row['returncode'] = returncode
+    row['wall_time'] = round(time.time() - t_start, 2)
+    try:
+        with open(os.path.join(job['path'], 'statistics.json')) as f:
+            row.update(json.load(f))
+    except (IOError, ValueError):
+        pass
+    return row
+
+
+def sweep(config, gym_config, axes, path, command=COMMAND, cars=1, n_workers=None):
+    """Runs all points of the grid `axes` and writes the results table to `path`/results.csv.
+
+    By default, as many runs are executed concurrently as the cores
+    can serve, given the MPI processes of a run and its environment.
+
+    """
+    for name in axes:
+        if name not in PARAMETERS:
+            raise ValueError('unknown parameter {!r}, expected one of {}'.format(name, PARAMETERS))
+
+    parsed = music_config.load(config)
+    n_procs = sum(section.np for section in parsed.sections.values())
+    if n_workers is None:
+        n_workers = max(1, multiprocessing.cpu_count() // (n_procs + 1))
+
+    points = grid(axes)
+    jobs = [{
+        'path': os.path.join(os.path.abspath(path), 'run_{:04d}'.format(i)),
+        'config': config,
+        'gym_config': os.path.abspath(gym_config),
+        'point': point,
+        'command': command,
+        'np': n_procs,
+        'cars': cars,
+    } for i, point in enumerate(points)]
+
+    print('{} runs, {} at a time'.format(len(jobs), n_workers))
+    # the runs are subprocesses, workers only wait for them
+    pool = multiprocessing.pool.ThreadPool(n_workers)
+    rows = []
+    for row in pool.imap_unordered(run, jobs):
+        print(', '.join('{}={}'.format(key, value) for key, value in row.items()))
+        rows.append(row)
+    pool.close()
+    pool.join()
+
+    rows.sort(key=lambda row: row['run'])
+    columns = []
+    for row in rows:
+        columns.extend(key for key in row if key not in columns)
+    with open(os.path.join(path, 'results.csv'), 'w') as f:
+        writer = csv.DictWriter(f, columns)
+        writer.writeheader()
+        writer.writerows(rows)
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Run a parameter sweep of the closed loop.')
+    parser.add_argument('config', help='MUSIC config of the toolchain')
+    parser.add_argument('gym_config', help='gymz config of the environment')
+    parser.add_argument('--grid', action='append', default=[], metavar='NAME=V1,V2,...', help='values of a parameter, one of {}'.format(', '.join(PARAMETERS)))
+    parser.add_argument('--out', default='sweep', help='directory of the runs and results.csv')
+    parser.add_argument('--command', default=COMMAND, help='command running the toolchain, with placeholders {np}, {config} and {nest_args}')
+    parser.add_argument('--cars', type=int, default=1, help='cars of the environment, needs to match the width of the config')
+    parser.add_argument('--workers', type=int, default=None, help='concurrent runs, by default derived from the number of cores')
+    args = parser.parse_args()
+
+    axes = collections.OrderedDict()
+    for axis in args.grid:
+        name, _, values = axis.partition('=')
+        axes[name] = [float(value) for value in values.split(',')]
+
+    sweep(args.config, args.gym_config, axes, args.out, args.command, args.cars, args.workers)
+
+
+if __name__ == '__main__':
+    main()
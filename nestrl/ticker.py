@@ -0,0 +1,91 @@
+"""Drift-free pacing of periodic loops.
+
+Sleeping for `dt` after doing some work makes the real period
+`dt + work + jitter`, so the loop slowly drifts away from wall-clock
+time (and hence from MUSIC running with ``rtf=1.``). `Ticker` instead
+schedules tick `k` at the absolute deadline `start + k * dt` on a
+monotonic clock and only sleeps for the time remaining until then.
+
+Example::
+
+    ticker = Ticker(dt=0.001, t_max=10.)
+    for t in ticker:
+        ...  # do work for logical time t
+    print('missed', ticker.missed, 'ticks')
+
+"""
+
+import math
+import time
+
+
+class Ticker(object):
+    """Iterates over logical times `k * dt`, yielding tick `k` at its deadline.
+
+    If the loop body overruns by one or more full periods, the ticks
+    that could not be served are skipped (`skip_missed=True`, default)
+    so that logical time stays aligned with wall-clock time, or served
+    back-to-back without sleeping until the loop has caught up
+    (`skip_missed=False`). Either way no drift accumulates.
+
+    To reduce wake-up jitter, the last `spin` seconds before each
+    deadline are busy-waited instead of slept.
+
+    """
+
+    def __init__(self, dt, t_max=None, skip_missed=True, spin=0., clock=time.monotonic, sleep=time.sleep):
+        if dt <= 0.:
+            raise ValueError('dt needs to be positive, got {}'.format(dt))
+        self.dt = dt
+        self.n_ticks = None if t_max is None else int(math.ceil(t_max / dt - 1e-9))
+        self.skip_missed = skip_missed
+        self.spin = spin
+        self._clock = clock
+        self._sleep = sleep
+
+        self.start = None
+        self.tick = 0
+        self.missed = 0  # ticks skipped because of overruns
+        self.late = 0  # ticks that started after their deadline
+
+    def __iter__(self):
+        self.start = self._clock()
+        self.tick = 0
+        while self.n_ticks is None or self.tick < self.n_ticks:
+            yield self.tick * self.dt
+            self.wait()
+
+    def elapsed(self):
+        """Returns the wall-clock time since the first tick.
+
+        """
+        return self._clock() - self.start
+
+    def wait(self):
+        """Advances to the next tick and waits for its deadline.
+
+        Returns the number of ticks skipped because of an overrun.
+
+        """
+        self.tick += 1
+        deadline = self.start + self.tick * self.dt
+        now = self._clock()
+
+        if now >= deadline:
+            self.late += 1
+            skipped = int((now - deadline) / self.dt) if self.skip_missed else 0
+            self.tick += skipped
+            self.missed += skipped
+            return skipped
+
+        if deadline - now > self.spin:
+            self._sleep(deadline - now - self.spin)
+        while self._clock() < deadline:
+            pass
+        return 0
+
+    def summary(self):
+        """Returns a one-line report of missed and late ticks.
+
+        """
+        return '{} ticks served, {} late, {} missed'.format(self.tick - self.missed, self.late, self.missed)
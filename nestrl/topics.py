@@ -0,0 +1,102 @@
+"""Multiplexing several streams over one socket by topic.
+
+Giving every stream its own port means a new socket and config entry
+for every observation channel, environment or monitoring consumer.
+Instead, a publisher can send every stream under its own topic over a
+single socket: `codec.send` with ``topic=...`` sends a frame holding
+the topic, followed by the message frame. Subscribers only receive the
+topics they subscribed to (by prefix, see `subscribe`), and ZMQ
+filters them on the publisher side, so unsubscribed streams cost no
+bandwidth. `codec.recv_topic` returns the topic of a message, and
+`nestrl.aio.AsyncReceiver` yields topic'd messages under the address
+`source(addr, topic)`.
+
+`proxy` fans the streams of several publishers out to any number of
+subscribers via an XSUB/XPUB pair: frames are forwarded as they are,
+without decoding or re-serializing them, and subscriptions are passed
+upstream, so publishers only send what some subscriber wants::
+
+    $ python -m nestrl.topics tcp://localhost:5556 tcp://localhost:5558 --bind tcp://*:5560
+
+Topic frames are only understood by Python components using
+`nestrl.codec`; the MUSIC adapters and gymz expect single-frame
+messages.
+
+"""
+
+import argparse
+
+import zmq
+
+OBSERVATION = 'obs/'
+COMMAND = 'cmd/'
+
+
+def topic(prefix, index):
+    """Returns the topic of stream `index` (e.g. an environment) under `prefix`, e.g. ``b'obs/3/'``.
+
+    Topics end with a delimiter, since subscriptions match by prefix:
+    without it, subscribing to stream 1 would also receive 10, 11, ...
+
+    """
+    return '{}{}/'.format(prefix, index).encode()
+
+
+def source(addr, topic):
+    """Returns the name of the stream `topic` published on `addr`, e.g. ``tcp://localhost:5556/obs/3``.
+
+    """
+    if not topic:
+        return addr
+    return '{}/{}'.format(addr, topic.decode(errors='replace').rstrip('/'))
+
+
+def subscribe(sock, topics):
+    """Subscribes `sock` to all messages whose topic starts with one of `topics`.
+
+    `topics` is a single topic or a list of topics (bytes or str); the
+    empty topic subscribes to everything.
+
+    """
+    if isinstance(topics, (bytes, str)):
+        topics = [topics]
+    for t in topics:
+        sock.setsockopt(zmq.SUBSCRIBE, t.encode() if isinstance(t, str) else t)
+
+
+def proxy(upstream, downstream, ctx=None):
+    """Forwards the messages of the publishers at `upstream` to subscribers of `downstream`.
+
+    `upstream` is a list of addresses of publishers to connect to,
+    `downstream` the address the subscribers connect to. Blocks until
+    the context is terminated.
+
+    """
+    ctx = zmq.Context.instance() if ctx is None else ctx
+    xsub = ctx.socket(zmq.XSUB)
+    for addr in upstream:
+        xsub.connect(addr)
+    xpub = ctx.socket(zmq.XPUB)
+    xpub.bind(downstream)
+    try:
+        zmq.proxy(xsub, xpub)
+    finally:
+        xsub.close(linger=0)
+        xpub.close(linger=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Forward topic-multiplexed streams of several publishers to any number of subscribers.')
+    parser.add_argument('upstream', nargs='+', help='addresses of the publishers')
+    parser.add_argument('--bind', default='tcp://*:5560', help='address the subscribers connect to')
+    args = parser.parse_args()
+
+    print('forwarding {} to {}'.format(', '.join(args.upstream), args.bind))
+    try:
+        proxy(args.upstream, args.bind)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,55 @@
+"""Choosing the transport of a sender by the scheme of its address.
+
+- ``tcp://``: ZMQ PUB socket, works across hosts
+- ``ipc://``: ZMQ PUB socket on a Unix domain socket, same host only,
+  e.g. ``ipc:///tmp/nestrl-5556``
+- ``shm://``: shared memory ring of `nestrl.shm`, same host only and a
+  single receiver, e.g. ``shm://nestrl-5556``
+
+`nestrl.aio.AsyncReceiver` accepts the same addresses (with ``tcp://``
+addresses of the publisher instead of ``tcp://*``).
+``benchmarks/transport_latency.py`` compares the three.
+
+"""
+
+import zmq
+
+from . import codec
+from . import shm
+
+
+class Sender(object):
+    """Publishes messages of up to `n_channels` channels on `addr`.
+
+    `fmt` is the wire format of ZMQ transports; rings always use the
+    binary format.
+
+    """
+
+    def __init__(self, addr, n_channels=1, fmt='binary', ctx=None, capacity=64):
+        self.addr = addr
+        self.fmt = fmt
+        if addr.startswith(shm.SCHEME):
+            self.ring = shm.RingWriter(addr, n_channels, capacity)
+            self.sock = None
+        else:
+            self.ring = None
+            self.sock = (zmq.Context.instance() if ctx is None else ctx).socket(zmq.PUB)
+            self.sock.bind(addr)
+
+    def send(self, msg, message_type=codec.OBSERVATION, topic=None):
+        """Sends `msg`, under `topic` if given (see `nestrl.topics`; not supported by rings).
+
+        """
+        if self.ring is not None:
+            if topic is not None:
+                raise ValueError('topics are not supported by {} addresses'.format(shm.SCHEME))
+            self.ring.send(msg, message_type)
+        else:
+            codec.send(self.sock, msg, self.fmt, message_type, topic=topic)
+
+    def close(self):
+        if self.ring is not None:
+            self.ring.close()
+        else:
+            self.sock.close()
@@ -0,0 +1,88 @@
+import json
+
+import numpy as np
+import pytest
+import zmq
+
+from nestrl import codec
+
+
+def observation():
+    return codec.GymObservation([-1.2, -0.07], [0.6, 0.07], [-0.5, 0.01], ts=[1.5e9, 1.5e9 + 0.25])
+
+
+def test_binary_round_trip():
+    msg = observation()
+    frame = codec.encode_binary(msg, codec.COMMAND)
+    assert len(frame) == codec.frame_size(2)
+    message_type, decoded = codec.decode_binary(frame)
+    assert message_type == codec.COMMAND
+    np.testing.assert_array_equal(decoded, msg)
+
+
+def test_binary_into_preallocated_buffer():
+    out = bytearray(codec.frame_size(4))
+    frame = codec.encode_binary(observation(), out=out)
+    assert len(frame) == codec.frame_size(2)
+    np.testing.assert_array_equal(codec.decode(frame), observation())
+
+
+def test_json_round_trip_and_binary_agree():
+    msg = observation()
+    text = json.dumps(codec.encode_json(msg)).encode()
+    assert not codec.is_binary(text)
+    np.testing.assert_array_equal(codec.decode(text), msg)
+    np.testing.assert_array_equal(codec.decode(text), codec.decode(codec.encode_binary(msg)))
+
+
+def test_json_missing_limits_and_ts_are_nan():
+    msg = codec.decode(b'[{"value": 0.5}]')
+    assert msg[0]['value'] == 0.5
+    assert np.isnan(msg[0]['min']) and np.isnan(msg[0]['max']) and np.isnan(msg[0]['ts'])
+
+
+def test_binary_rejects_other_versions():
+    frame = bytearray(codec.encode_binary(observation()))
+    frame[2] = codec.VERSION + 1
+    with pytest.raises(ValueError):
+        codec.decode_binary(frame)
+
+
+def test_spike_batch_round_trip():
+    batch = codec.SpikeBatch(10., 11., np.array([10.1, 10.1, 10.7]), np.array([3, 4000, 3], dtype=np.uint32))
+    frame = codec.encode_spikes(batch)
+    assert len(frame) == codec.spike_frame_size(3)
+    message_type, decoded = codec.decode_binary(frame)
+    assert message_type == codec.SPIKES
+    assert (decoded.t_start, decoded.t_stop) == (10., 11.)
+    np.testing.assert_array_equal(decoded.times, batch.times)
+    np.testing.assert_array_equal(decoded.channels, batch.channels)
+
+
+def test_empty_spike_batch():
+    decoded = codec.decode(codec.encode_spikes(codec.SpikeBatch(0., 1., np.empty(0), np.empty(0, dtype=np.uint32))))
+    assert len(decoded.times) == 0 and len(decoded.channels) == 0
+
+
+@pytest.mark.parametrize('fmt', codec.FORMATS)
+def test_send_recv_with_and_without_topic(fmt):
+    ctx = zmq.Context()
+    push = ctx.socket(zmq.PUSH)
+    push.bind('inproc://codec')
+    pull = ctx.socket(zmq.PULL)
+    pull.connect('inproc://codec')
+
+    codec.send(push, observation(), fmt, topic='obs/0/')
+    codec.send(push, observation(), fmt)
+    codec.send(push, codec.SpikeBatch(0., 1., np.array([0.5]), np.array([7], dtype=np.uint32)), fmt, topic=b'spikes/')
+
+    topic, msg = codec.recv_topic(pull)
+    assert topic == b'obs/0/'
+    np.testing.assert_array_equal(msg, observation())
+    np.testing.assert_array_equal(codec.recv(pull), observation())
+    topic, batch = codec.recv_topic(pull)
+    assert topic == b'spikes/' and list(batch.channels) == [7]
+
+    push.close(linger=0)
+    pull.close(linger=0)
+    ctx.term()
@@ -0,0 +1,26 @@
+import numpy as np
+
+from nestrl import codec
+from nestrl.freshness import Freshness
+
+
+def spike_batch(t_start):
+    return codec.SpikeBatch(t_start, t_start + 1., np.array([t_start + 0.5]), np.array([0], dtype=np.uint32))
+
+
+def test_stale_observations_are_dropped():
+    freshness = Freshness(max_age=0.1, clock=lambda: 100.)
+    fresh = codec.GymObservation(-1., 1., [0.], ts=99.95)
+    stale = codec.GymObservation(-1., 1., [0.], ts=99.)
+    assert freshness.filter([('a', stale), ('a', fresh)]) == [('a', fresh)]
+    assert freshness.n_dropped == 1
+
+
+def test_spike_batches_are_never_stale_nor_conflated():
+    freshness = Freshness(conflate=True, max_age=0.1, clock=lambda: 100.)
+    batches = [('spikes', spike_batch(t)) for t in (0., 1., 2.)]
+    assert freshness.is_fresh(batches[0][1])
+    obs = [('gym', codec.GymObservation(-1., 1., [float(i)], ts=100.)) for i in range(2)]
+    kept = freshness.filter([batches[0], obs[0], batches[1], obs[1], batches[2]])
+    assert kept == [batches[0], batches[1], obs[1], batches[2]]
+    assert (freshness.n_accepted, freshness.n_dropped, freshness.n_conflated) == (4, 0, 1)
@@ -0,0 +1,91 @@
+import multiprocessing
+import os
+
+import numpy as np
+import pytest
+
+from nestrl import codec, shm
+
+
+@pytest.fixture
+def addr(request):
+    return 'shm://nestrl_test_{}_{}'.format(os.getpid(), request.node.name)
+
+
+def value(i):
+    return codec.GymObservation(0., 1., [float(i), -float(i)], ts=0.)
+
+
+def test_overflow_drops_new_frames(addr):
+    writer = shm.RingWriter(addr, 2, capacity=4)
+    reader = shm.RingReader(addr)
+    try:
+        assert [writer.send(value(i)) for i in range(6)] == [True] * 4 + [False] * 2
+        assert (writer.n_sent, writer.n_dropped) == (4, 2)
+        assert [msg['value'][0] for msg in reader.drain()] == [0., 1., 2., 3.]
+        assert reader.poll() is None
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_wrap_around_keeps_order(addr):
+    writer = shm.RingWriter(addr, 2, capacity=3)
+    reader = shm.RingReader(addr)
+    try:
+        received = []
+        # interleaved batches of varying size wrap around the ring several times
+        i = 0
+        for batch in [2, 3, 1, 3, 2, 3, 3]:
+            for _ in range(batch):
+                assert writer.send(value(i))
+                i += 1
+            received.extend(reader.drain())
+        assert [msg['value'][0] for msg in received] == list(range(i))
+        np.testing.assert_array_equal(received[-1], value(i - 1))
+    finally:
+        reader.close()
+        writer.close()
+
+
+def test_messages_with_fewer_channels(addr):
+    writer = shm.RingWriter(addr, 4, capacity=2)
+    reader = shm.RingReader(addr)
+    try:
+        writer.send(codec.GymCommand(0., 2., [1.]), codec.COMMAND)
+        msg = reader.recv(timeout=1.)
+        assert len(msg) == 1 and msg[0]['value'] == 1.
+        with pytest.raises(ValueError):
+            writer.send(codec.GymObservation(0., 1., np.zeros(5)))
+    finally:
+        reader.close()
+        writer.close()
+
+
+def _read(addr, n, queue):
+    reader = shm.RingReader(addr)
+    values = []
+    while len(values) < n:
+        msg = reader.recv(timeout=10.)
+        if msg is None:
+            break
+        values.append(float(msg['value'][0]))
+    reader.close()
+    queue.put(values)
+
+
+def test_single_writer_and_reader_process(addr):
+    n = 2000
+    writer = shm.RingWriter(addr, 2, capacity=8)
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=_read, args=(addr, n, queue))
+    process.start()
+    try:
+        for i in range(n):
+            assert writer.send(value(i), block=True)
+        values = queue.get(timeout=30.)
+        process.join(10.)
+    finally:
+        writer.close()
+    assert values == [float(i) for i in range(n)]
+    assert writer.n_dropped == 0
@@ -0,0 +1,34 @@
+import time
+
+import zmq
+
+from nestrl import codec, topics
+
+
+def test_subscription_selects_single_stream_among_many():
+    ctx = zmq.Context()
+    pub = ctx.socket(zmq.PUB)
+    pub.bind('inproc://topics')
+    sub = ctx.socket(zmq.SUB)
+    sub.connect('inproc://topics')
+    topics.subscribe(sub, topics.topic(topics.OBSERVATION, 1))
+    time.sleep(0.1)  # let the subscription reach the publisher
+
+    n_streams = 12  # streams 10 and 11 share the prefix of stream 1
+    for i in range(n_streams):
+        codec.send(pub, codec.GymObservation(-1., 1., [float(i)]), 'json', topic=topics.topic(topics.OBSERVATION, i))
+
+    received = []
+    while sub.poll(100):
+        topic, msg = codec.recv_topic(sub)
+        received.append((topic, float(msg['value'][0])))
+    assert received == [(b'obs/1/', 1.)]
+
+    pub.close(linger=0)
+    sub.close(linger=0)
+    ctx.term()
+
+
+def test_source_names_stream_without_delimiter():
+    assert topics.source('tcp://localhost:5556', topics.topic(topics.OBSERVATION, 3)) == 'tcp://localhost:5556/obs/3'
+    assert topics.source('tcp://localhost:5556', b'') == 'tcp://localhost:5556'